@@ -1,7 +1,27 @@
+import argparse
+import hashlib
+import inspect
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pygame
 import random
 import time
 
+from redemu_assets import SurfaceCache, content_key
+from redemu_battle import Pokemon, PokemonBox, apply_attack
+from redemu_clock import RENDER_RATES, FixedStepClock
+from redemu_display import DirtyRegions
+from redemu_encounters import TILE_TYPE_LIMIT, compile_encounters, uniform_encounters
+from redemu_maps import (INTERACT_TRIGGERS, STEP_TRIGGERS, TRIGGER_DOOR, TRIGGER_NPC, TRIGGER_SIGN,
+                         TRIGGER_STEP, MapPack, Trigger, TriggerGrid, write_map_pack)
+from redemu_profile import OVERLAY_FONT_SIZE, OVERLAY_REFRESH_SECONDS, FrameProfiler, render_overlay
+from redemu_replay import InputRecording
+from redemu_save import (SaveWriter, decode_map_edits, decode_party, decode_player, encode_map_edits, encode_party,
+                         encode_player, load_save)
+from redemu_scheduler import TickScheduler, ticks_for_ms
+from redemu_text import TextSurfaceCache, paginate_text, wrap_text
+
 # --- Configuration ---
 SCREEN_WIDTH = 480
 SCREEN_HEIGHT = 320
@@ -9,6 +29,14 @@ TILE_SIZE = 16
 PLAYER_SIZE = 12
 TEXT_BOX_HEIGHT = 80
 FONT_SIZE = 18
+IDLE_WAIT_MAX_MS = 1000 # Longest the idle loop sleeps before re-checking its wakeups
+TICK_RATE = 30 # Game logic ticks per second of game time
+DEFAULT_RENDER_FPS = 60 # Frame cap; 0 renders as fast as possible
+WALK_TICKS = 4 # Ticks a one-tile step takes to slide across the screen
+TEXT_BOX_LINES = 3 # Lines of dialogue per textbox page
+TEXT_REVEAL_CHARS_PER_TICK = 2 # Typewriter speed
+AUTOSAVE_INTERVAL_SECONDS = 30 # Real time between background autosaves
+SAVE_ENCODERS = {b"PLYR": encode_player, b"PRTY": encode_party, b"MAPS": encode_map_edits}
 
 # --- Colors (RGB) ---
 BLACK = (0, 0, 0)
@@ -23,6 +51,8 @@ LIGHT_YELLOW = (255, 255, 224)
 UI_BORDER_COLOR = (50, 50, 50)
 ROOF_RED = (200, 50, 50) # For Kanto house roofs
 BUILDING_WALL_LIGHT = (200, 200, 180) # For Kanto building walls
+# Every color draw_tile uses; part of the asset cache key
+TILE_PALETTE = (BLACK, WHITE, GREEN, DARK_GREEN, BROWN, GREY, RED, WATER_BLUE, LIGHT_YELLOW, ROOF_RED, BUILDING_WALL_LIGHT)
 
 # --- Game States ---
 STATE_OVERWORLD = "overworld"
@@ -43,6 +73,18 @@ STATE_TEXTBOX = "textbox"
 # 10: Tree Trunk (Brown)
 # 11: Tree Leaves (Dark Green)
 # 12: Flowers (Various colors on grass)
+TILE_TYPE_COUNT = 13
+
+# --- Per-Tile-Type Lookup Tables ---
+# Indexed by tile value, so a whole map can be turned into a mask with TABLE[map].
+TILE_PASSABLE = np.ones(256, dtype=bool)
+TILE_PASSABLE[[2, 3, 5, 6, 10, 11]] = False
+# Chance per step on the encounter tiles of version 1 map packs, which carry no encounter tables
+TILE_ENCOUNTER_RATE = np.zeros(256, dtype=np.float32)
+TILE_ENCOUNTER_RATE[1] = 0.10
+TILE_ENCOUNTER_RATE[9] = 0.20 # Tall grass
+# Tile each trigger kind paints onto its cell when a map is built
+TRIGGER_TILES = {TRIGGER_DOOR: 7, TRIGGER_SIGN: 8, TRIGGER_NPC: 4}
 
 # --- Kanto Map Structure ---
 # Dimensions for Kanto maps can vary. For now, these are just examples.
@@ -51,11 +93,11 @@ KANTO_MAP_BASE_HEIGHT = 20 # (SCREEN_HEIGHT - TEXT_BOX_HEIGHT) // TILE_SIZE
 
 # Example: Pallet Town (Tiny version for now)
 pallet_town_map_data = [
-    [2, 2, 2, 2, 5, 5, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2],
-    [2, 1, 1, 6, 7, 6, 1, 1, 0, 1, 1, 2, 5, 5, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2],
-    [2, 1, 1, 6, 6, 6, 1, 0, 0, 0, 1, 2, 6, 6, 2, 1, 8, 0, 0, 0, 0, 0, 0, 9, 9, 9, 9, 9, 1, 2], # Path to Route 1 -> (0,0,0...)
+    [2, 2, 2, 2, 5, 5, 2, 2, 0, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2], # North exit to Route 1
+    [2, 1, 1, 6, 6, 6, 1, 1, 0, 1, 1, 2, 5, 5, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2],
+    [2, 1, 1, 6, 7, 6, 1, 0, 0, 0, 1, 2, 6, 6, 2, 1, 8, 0, 0, 0, 0, 0, 0, 9, 9, 9, 9, 9, 1, 2], # Path to Route 1 -> (0,0,0...)
     [2, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 2, 7, 6, 2, 1, 1, 0, 1, 1, 1, 1, 9, 9, 9, 9, 9, 9, 1, 2],
-    [2, 2, 2, 2, 8, 2, 2, 0, 2, 2, 2, 2, 2, 2, 2, 1, 1, 0, 1, 1, 1, 9, 9, 9, 1, 1, 1, 1, 1, 2],
+    [2, 2, 2, 2, 8, 2, 2, 0, 2, 2, 2, 2, 0, 2, 2, 1, 1, 0, 1, 1, 1, 9, 9, 9, 1, 1, 1, 1, 1, 2],
     [2, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2],
     [2, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 2], # Lab area fence / water edge
     [2, 1, 0, 6, 6, 6, 6, 6, 6, 6, 6, 0, 6, 6, 6, 6, 6, 0, 6, 6, 6, 6, 6, 6, 6, 6, 0, 1, 1, 2],
@@ -69,62 +111,172 @@ pallet_town_map_data = [
 for _ in range(len(pallet_town_map_data), KANTO_MAP_BASE_HEIGHT):
     pallet_town_map_data.append([2] * KANTO_MAP_BASE_WIDTH)
 
-# --- Placeholder Pokemon Data ---
-POKEMON_DATA = {
-    "KITTENPUNCH": {"hp": 30, "max_hp": 30, "attack": 8, "defense": 5, "sprite_color": (255, 105, 180)},
-    "BARKBITE": {"hp": 35, "max_hp": 35, "attack": 7, "defense": 6, "sprite_color": (160, 82, 45)},
-    "PIXELPUP": {"hp": 25, "max_hp": 25, "attack": 9, "defense": 4, "sprite_color": (173, 216, 230)},
+route_1_map_data = [
+    [11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 2, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11], # Gate to Viridian (closed)
+    [11, 10, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 10, 11],
+    [11, 11, 1, 9, 9, 9, 9, 9, 9, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 12, 1, 1, 11, 11],
+    [11, 10, 1, 9, 9, 9, 9, 9, 9, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 10, 11],
+    [11, 11, 1, 9, 9, 9, 9, 9, 9, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 11, 11],
+    [11, 10, 1, 9, 9, 9, 9, 9, 9, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 10, 11],
+    [11, 11, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 9, 9, 9, 9, 9, 9, 9, 1, 11, 11],
+    [11, 10, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 9, 9, 9, 9, 9, 9, 9, 1, 10, 11],
+    [11, 11, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 9, 9, 9, 9, 9, 9, 9, 1, 11, 11],
+    [11, 10, 1, 1, 1, 1, 12, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 9, 9, 9, 9, 9, 9, 9, 1, 10, 11],
+    [11, 11, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 9, 9, 9, 9, 9, 9, 9, 1, 11, 11],
+    [11, 10, 1, 1, 1, 1, 11, 11, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 10, 11],
+    [11, 11, 1, 1, 1, 1, 10, 10, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 11, 11],
+    [11, 10, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 10, 11],
+    [11, 11, 1, 9, 9, 9, 9, 9, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 11, 11, 1, 1, 11, 11],
+    [11, 10, 1, 9, 9, 9, 9, 9, 1, 1, 0, 1, 1, 1, 12, 1, 1, 1, 1, 1, 1, 1, 12, 1, 10, 10, 1, 1, 10, 11],
+    [11, 11, 1, 9, 9, 9, 9, 9, 1, 1, 0, 1, 1, 1, 1, 12, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 11, 11],
+    [11, 10, 1, 9, 9, 9, 9, 9, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 10, 11],
+    [11, 11, 1, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 11, 11],
+    [11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 0, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11, 11], # South exit to Pallet Town
+]
+
+players_house_map_data = [
+    [6, 6, 6, 6, 6, 6, 6, 6, 6, 6],
+    [6, 0, 0, 0, 0, 0, 0, 0, 0, 6],
+    [6, 0, 0, 0, 0, 0, 0, 0, 0, 6],
+    [6, 0, 0, 0, 0, 0, 0, 0, 0, 6],
+    [6, 0, 0, 0, 0, 0, 0, 0, 0, 6],
+    [6, 0, 0, 0, 0, 0, 0, 0, 0, 6],
+    [6, 0, 0, 0, 0, 0, 0, 0, 0, 6],
+    [6, 6, 6, 6, 7, 6, 6, 6, 6, 6], # Front door back out to Pallet Town
+]
+
+# --- Kanto Triggers (kind, x, y, message[, warp target]) ---
+# Doors with a target warp the player when stepped on; Z on any door reads its message.
+KANTO_TRIGGERS = {
+    "pallet_town": [
+        (TRIGGER_DOOR, 4, 2, "This is your house! Get in there!", ("players_house", 4, 6)),
+        (TRIGGER_SIGN, 4, 4, "RIVAL'S HOUSE - Keep out!"),
+        (TRIGGER_DOOR, 12, 3, "PROF. OAK'S LAB - SCIENCE!"),
+        (TRIGGER_SIGN, 16, 2, "PALLET TOWN - A sleepy little town."),
+        (TRIGGER_SIGN, 7, 2, "Route 1 this way -> Go get 'em, tiger!"),
+    ],
+    "route_1": [
+        (TRIGGER_SIGN, 11, 17, "ROUTE 1 - PALLET TOWN - VIRIDIAN CITY"),
+        (TRIGGER_NPC, 17, 8, "The tall grass is where wild POKEMON hide. Stick to the path if you're tired!"),
+    ],
+    "players_house": [
+        (TRIGGER_NPC, 6, 2, "MOM: Right. All boys leave home some day. It said so on TV."),
+        (TRIGGER_DOOR, 4, 7, "The door leads back out to PALLET TOWN.", ("pallet_town", 4, 3)),
+    ],
 }
 
-# --- Simple Text Wrapping ---
-def wrap_text(text, font, max_width):
-    words = text.split(' ')
-    lines = []
-    current_line = ""
-    for word in words:
-        test_line = current_line + word + " "
-        if font.size(test_line)[0] <= max_width:
-            current_line = test_line
-        else:
-            lines.append(current_line.strip())
-            current_line = word + " "
-    lines.append(current_line.strip())
-    return lines
+# --- Wild Encounters ---
+# Per map and tile type: (chance per step, ((species, weight, min level, max level), ...)).
+# Weights are relative within a table; each table is compiled into an alias sampler when its map loads.
+PALLET_TOWN_ENCOUNTERS = {
+    1: (0.10, (("PIXELPUP", 60, 2, 4), ("KITTENPUNCH", 40, 2, 3))),
+    9: (0.20, (("PIXELPUP", 40, 3, 5), ("KITTENPUNCH", 35, 3, 5), ("BARKBITE", 25, 4, 6))), # Tall grass
+}
+ROUTE_1_ENCOUNTERS = {
+    1: (0.10, (("BARKBITE", 50, 2, 5), ("PIXELPUP", 30, 2, 4), ("KITTENPUNCH", 20, 3, 5))),
+    9: (0.20, (("BARKBITE", 45, 3, 6), ("KITTENPUNCH", 35, 3, 6), ("PIXELPUP", 20, 4, 7))), # Tall grass
+}
+
+# --- Kanto Maps ---
+# Edge connections are (map_id, x, y) landing spots for walking off that edge.
+KANTO_MAP_DEFS = {
+    "pallet_town": {
+        "tiles": pallet_town_map_data,
+        "connections": {
+            "NORTH_EDGE": ("route_1", 10, KANTO_MAP_BASE_HEIGHT - 2),
+        },
+        "encounters": PALLET_TOWN_ENCOUNTERS,
+    },
+    "route_1": {
+        "tiles": route_1_map_data,
+        "connections": {
+            "SOUTH_EDGE": ("pallet_town", 8, 0),
+        },
+        "encounters": ROUTE_1_ENCOUNTERS,
+    },
+    "players_house": {
+        "tiles": players_house_map_data,
+        "connections": {},
+        "encounters": {},
+    },
+}
+EDGE_CONNECTIONS = {'LEFT': "WEST_EDGE", 'RIGHT': "EAST_EDGE", 'UP': "NORTH_EDGE", 'DOWN': "SOUTH_EDGE"}
 
 class RedEmuGame:
-    def __init__(self):
+    def __init__(self, headless=False, seed=None, map_pack=None, asset_cache=True,
+                 render_fps=DEFAULT_RENDER_FPS, time_scale=1.0):
         pygame.init()
+        self.headless = headless
+        # Every random decision goes through this generator so a seed plus the
+        # recorded inputs reproduce a session exactly.
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.input_recording = None
         self.actual_screen_height = SCREEN_HEIGHT
         self.game_screen_height = SCREEN_HEIGHT - TEXT_BOX_HEIGHT
         self.map_display_width = SCREEN_WIDTH
         self.map_display_height = self.game_screen_height
 
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, self.actual_screen_height))
-        pygame.display.set_caption("RedEMU Kanto")
-        self.clock = pygame.time.Clock()
+        if headless:
+            # No window at all: frames are still composed, just never presented.
+            self.screen = pygame.Surface((SCREEN_WIDTH, self.actual_screen_height))
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, self.actual_screen_height))
+            pygame.display.set_caption("RedEMU Kanto")
+        self.map_canvas_rect = pygame.Rect(0, 0, self.map_display_width, self.map_display_height)
+        self.map_canvas = self.screen.subsurface(self.map_canvas_rect)
+        self.textbox_rect = pygame.Rect(0, self.game_screen_height, SCREEN_WIDTH, TEXT_BOX_HEIGHT)
+        self.battle_enemy_panel_rect = pygame.Rect(SCREEN_WIDTH - 150, 20, 150, 112)
+        self.battle_player_panel_rect = pygame.Rect(30, self.actual_screen_height - 230, 150, 112)
+        self.dirty_regions = DirtyRegions(self.screen.get_rect())
+        self.last_frame_keys = {}
+        # Logic advances in fixed ticks; frames are drawn at render_fps and
+        # interpolate between the last two ticks.
+        self.frame_clock = FixedStepClock(TICK_RATE, render_fps, time_scale)
+        self.tick_count = 0
+        self.walk_from_view = None
+        self.walk_start_tick = 0
+        self.scheduler = TickScheduler()  # Battle pacing and other delayed callbacks, on game ticks
         self.font = pygame.font.Font(None, FONT_SIZE)
         self.large_font = pygame.font.Font(None, FONT_SIZE + 6)
+        self.text_cache = TextSurfaceCache()
+        # Baked tiles and map backgrounds are reused across launches until
+        # the tile drawing code, palette, TILE_SIZE or map contents change.
+        self.asset_cache = SurfaceCache() if asset_cache else None
+        self.tile_definition_key = content_key(inspect.getsource(RedEmuGame.draw_tile), TILE_SIZE,
+                                               TILE_TYPE_COUNT, TILE_PALETTE)
+        self.tile_atlas = self.build_tile_atlas()
 
         self.game_state = STATE_OVERWORLD
         
         # --- Kanto Map Management ---
         self.kanto_maps = {}
+        # Maps come from the literals above unless a binary map pack is given;
+        # a pack is memory-mapped and each map is only read when first built.
+        self.map_pack = MapPack(map_pack) if map_pack else None
+        self.map_prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map-prefetch")
+        self.map_prefetch_futures = {}
+        self.map_version = 0
+        # Every tile changed since the game began, by map, and the maps changed since the last save.
+        self.map_edits = {}
+        self.dirty_map_edits = set()
+        self.shared_map_edits = set()  # Maps whose edit dicts went to the save thread; copied before the next edit
         self.current_kanto_map_id = "pallet_town"
         self.load_kanto_map_data()
         
-        self.current_map_data = self.kanto_maps[self.current_kanto_map_id]["map"]
-        self.current_map_width_tiles = len(self.current_map_data[0])
-        self.current_map_height_tiles = len(self.current_map_data)
-
         self.player_map_x_tile = 10
         self.player_map_y_tile = 5
+        self.player_facing = 'DOWN'
         self.camera_x_tile = 0
         self.camera_y_tile = 0
         self.center_camera_on_player()
 
-        self.textbox_message_queue = []
-        self.current_textbox_message_lines = []
-        self.textbox_line_index = 0
+        # Messages are wrapped, paginated and rendered when queued; the textbox
+        # only ever blits from the pages.
+        self.textbox_message_queue = deque()
+        self.dialogue_pages = []
+        self.dialogue_page_index = 0
+        self.dialogue_page_start_tick = 0
         self.textbox_active = False
 
         self.battle_active = False
@@ -136,41 +288,131 @@ class RedEmuGame:
 
         self.setup_player_pokemon()
 
-        # --- NPC and Sign Data for Kanto ---
-        self.kanto_interactions = {
-            ("pallet_town", 4, 1): "This is your house! Get in there!",
-            ("pallet_town", 4, 4): "RIVAL'S HOUSE - Keep out!",
-            ("pallet_town", 12, 1): "PROF. OAK'S LAB - SCIENCE!",
-            ("pallet_town", 16, 2): "PALLET TOWN - A sleepy little town.",
-            ("pallet_town", 7, 2): "Route 1 this way -> Go get 'em, tiger!",
-        }
-        self.place_interaction_tiles()
-
         self.hq_ripper_work_duration_seconds = 3600 * 24
-        self.hq_ripper_start_time = time.time()
+        self.hq_ripper_deadline = time.perf_counter() + self.hq_ripper_work_duration_seconds
+        self.hq_ripper_cycle_announced = False
+        self.idle_wait_enabled = True
+        # Frame-phase timings; F3 shows them over the game, --profile dumps them on exit.
+        self.profiler = FrameProfiler()
+        self.profile_dump_path = None
+        self.profile_overlay = None
+        self.profile_overlay_font = None
+        self.profile_overlay_deadline = None
+        self.save_writer = None
+        self.saved_state = {}
+        self.next_autosave_time = None
         print(f"CATSDK: Meow! Activated. Generating Kanto for {self.hq_ripper_work_duration_seconds / 3600:.2f} hours...")
 
-    def place_interaction_tiles(self):
-        for (map_id, x, y), message in self.kanto_interactions.items():
-            if map_id in self.kanto_maps:
-                if "door" in message.lower() or "house" in message.lower() and "sign" not in message.lower():
-                    if 0 <= y < len(self.kanto_maps[map_id]["map"]) and 0 <= x < len(self.kanto_maps[map_id]["map"][0]):
-                        self.kanto_maps[map_id]["map"][y][x] = 7
-                elif "sign" in message.lower() or "town" in message.lower() or "route" in message.lower():
-                    if 0 <= y < len(self.kanto_maps[map_id]["map"]) and 0 <= x < len(self.kanto_maps[map_id]["map"][0]):
-                        self.kanto_maps[map_id]["map"][y][x] = 8
+    def set_map_tile(self, map_id, x, y, tile_type):
+        # All tile mutations go through here so the baked surface and masks stay in sync.
+        map_entry = self.kanto_maps[map_id]
+        map_data = map_entry["map"]
+        height_tiles, width_tiles = map_data.shape
+        if 0 <= y < height_tiles and 0 <= x < width_tiles:
+            map_data[y, x] = tile_type
+            if map_id in self.shared_map_edits:
+                self.map_edits[map_id] = dict(self.map_edits[map_id])
+                self.shared_map_edits.discard(map_id)
+            self.map_edits.setdefault(map_id, {})[(x, y)] = tile_type
+            self.dirty_map_edits.add(map_id)
+            map_entry["passable"][y, x] = TILE_PASSABLE[tile_type]
+            map_entry["encounter_rate"][y, x] = map_entry["encounter_rates_by_tile"][tile_type]
+            map_entry["surface"].blit(self.tile_atlas[tile_type], (x * TILE_SIZE, y * TILE_SIZE))
+            self.map_version += 1
 
-    def load_kanto_map_data(self):
-        self.kanto_maps["pallet_town"] = {
-            "map": [row[:] for row in pallet_town_map_data],
-            "connections": {
-                "NORTH_EDGE": ("route_1", 10, KANTO_MAP_BASE_HEIGHT - 2),
-            },
-            "encounter_tiles": [1, 9]
+    def build_map_entry(self, tiles, connections, encounters, triggers=()):
+        # Pack tiles are copy-on-write views of the mapped file, so they are used as-is.
+        map_data = np.asarray(tiles, dtype=np.uint8) if self.map_pack else np.array(tiles, dtype=np.uint8)
+        height_tiles, width_tiles = map_data.shape
+        trigger_grid = TriggerGrid(width_tiles, height_tiles, (Trigger(*trigger) for trigger in triggers))
+        for trigger in trigger_grid.triggers:
+            if trigger.kind in TRIGGER_TILES:
+                map_data[trigger.y, trigger.x] = TRIGGER_TILES[trigger.kind]
+        encounter_tables = compile_encounters(encounters)
+        encounter_rates_by_tile = np.zeros(TILE_TYPE_LIMIT, dtype=np.float32)
+        for tile_type in encounters:
+            encounter_rates_by_tile[tile_type] = encounter_tables[tile_type].rate
+        return {
+            "map": map_data,
+            "passable": TILE_PASSABLE[map_data],
+            "encounter_rate": encounter_rates_by_tile[map_data],
+            "encounter_rates_by_tile": encounter_rates_by_tile,
+            "encounter_tables": encounter_tables,
+            "surface": self.bake_map_surface(map_data),
+            "triggers": trigger_grid,
+            "connections": connections,
+            "encounters": encounters,
         }
-        self.current_map_data = self.kanto_maps[self.current_kanto_map_id]["map"]
-        self.current_map_width_tiles = len(self.current_map_data[0])
-        self.current_map_height_tiles = len(self.current_map_data)
+
+    def bake_map_surface(self, map_data):
+        if self.asset_cache is None:
+            return self.blit_map_surface(map_data)
+        height_tiles, width_tiles = map_data.shape
+        key = content_key(self.tile_definition_key, map_data.shape, map_data.tobytes())
+        return self.asset_cache.get_or_bake(key, (width_tiles * TILE_SIZE, height_tiles * TILE_SIZE),
+                                            lambda: self.blit_map_surface(map_data), like=self.tile_atlas[0])
+
+    def blit_map_surface(self, map_data):
+        height_tiles, width_tiles = map_data.shape
+        map_surface = pygame.Surface((width_tiles * TILE_SIZE, height_tiles * TILE_SIZE), 0, self.tile_atlas[0])
+        atlas = self.tile_atlas
+        blit_sequence = []
+        for r_idx, row in enumerate(map_data.tolist()):
+            draw_y = r_idx * TILE_SIZE
+            for c_idx, tile_val in enumerate(row):
+                blit_sequence.append((atlas[tile_val], (c_idx * TILE_SIZE, draw_y)))
+        map_surface.blits(blit_sequence, False)
+        return map_surface
+
+    def build_kanto_map(self, map_id):
+        # Safe to run on the prefetch thread: it only creates new arrays and surfaces.
+        map_def = self.kanto_map_def(map_id)
+        return self.build_map_entry(
+            map_def["tiles"],
+            connections=map_def["connections"],
+            encounters=map_def["encounters"] if "encounters" in map_def
+            else uniform_encounters(map_def["encounter_tiles"], TILE_ENCOUNTER_RATE),
+            triggers=map_def["triggers"],
+        )
+
+    def kanto_map_def(self, map_id):
+        if self.map_pack:
+            return self.map_pack.load(map_id)
+        return dict(KANTO_MAP_DEFS[map_id], triggers=KANTO_TRIGGERS.get(map_id, ()))
+
+    def has_kanto_map(self, map_id):
+        return map_id in (self.map_pack if self.map_pack else KANTO_MAP_DEFS)
+
+    def get_kanto_map(self, map_id):
+        if map_id not in self.kanto_maps:
+            future = self.map_prefetch_futures.pop(map_id, None)
+            self.kanto_maps[map_id] = future.result() if future else self.build_kanto_map(map_id)
+        return self.kanto_maps[map_id]
+
+    def prefetch_connected_maps(self, map_id):
+        """Starts baking every map reachable in one step from map_id on the prefetch thread."""
+        map_entry = self.kanto_maps[map_id]
+        neighbours = [target[0] for target in map_entry["connections"].values()]
+        neighbours += [trigger.target[0] for trigger in map_entry["triggers"].triggers if trigger.target]
+        for neighbour_id in neighbours:
+            if self.has_kanto_map(neighbour_id) and neighbour_id not in self.kanto_maps \
+               and neighbour_id not in self.map_prefetch_futures:
+                self.map_prefetch_futures[neighbour_id] = self.map_prefetcher.submit(self.build_kanto_map, neighbour_id)
+
+    def load_kanto_map_data(self):
+        self.get_kanto_map(self.current_kanto_map_id)
+        self.set_current_map(self.current_kanto_map_id)
+
+    def set_current_map(self, map_id):
+        self.current_kanto_map_id = map_id
+        current_map = self.get_kanto_map(map_id)
+        self.current_map_data = current_map["map"]
+        self.current_triggers = current_map["triggers"]
+        self.current_passable = current_map["passable"]
+        self.current_encounter_rate = current_map["encounter_rate"]
+        self.current_encounter_tables = current_map["encounter_tables"]
+        self.current_map_height_tiles, self.current_map_width_tiles = self.current_map_data.shape
+        self.prefetch_connected_maps(map_id)
 
     def center_camera_on_player(self):
         screen_tiles_x = self.map_display_width // TILE_SIZE
@@ -179,14 +421,28 @@ class RedEmuGame:
         target_cam_y = self.player_map_y_tile - screen_tiles_y // 2
         self.camera_x_tile = max(0, min(target_cam_x, self.current_map_width_tiles - screen_tiles_x))
         self.camera_y_tile = max(0, min(target_cam_y, self.current_map_height_tiles - screen_tiles_y))
+        self.view = self.interpolated_view(0.0)
+
+    def logical_view(self):
+        # (camera x, camera y, player x, player y) in map pixels
+        return (self.camera_x_tile * TILE_SIZE, self.camera_y_tile * TILE_SIZE,
+                self.player_map_x_tile * TILE_SIZE, self.player_map_y_tile * TILE_SIZE)
+
+    def walking(self):
+        return self.walk_from_view is not None and self.tick_count < self.walk_start_tick + WALK_TICKS
+
+    def interpolated_view(self, alpha):
+        """Where the camera and player are drawn, alpha of the way into the current tick."""
+        target = self.logical_view()
+        if not self.walking():
+            return target
+        progress = (self.tick_count - self.walk_start_tick + alpha) / WALK_TICKS
+        if progress >= 1.0:
+            return target
+        return tuple(round(start + (end - start) * progress) for start, end in zip(self.walk_from_view, target))
 
     def setup_player_pokemon(self):
-        start_mon_name = "KITTENPUNCH"
-        data = POKEMON_DATA[start_mon_name]
-        self.player_pokemon = {
-            "name": start_mon_name, "hp": data["hp"], "max_hp": data["max_hp"],
-            "attack": data["attack"], "defense": data["defense"], "sprite_color": data["sprite_color"]
-        }
+        self.player_pokemon = Pokemon.of_species("KITTENPUNCH")
 
     def draw_tile(self, surface, tile_type, x_pixel, y_pixel):
         rect = pygame.Rect(x_pixel, y_pixel, TILE_SIZE, TILE_SIZE)
@@ -220,54 +476,96 @@ class RedEmuGame:
             pygame.draw.rect(surface, BROWN, (x_pixel, y_pixel, TILE_SIZE, TILE_SIZE//2),1)
         elif tile_type == 9: # Tall Grass
             pygame.draw.rect(surface, DARK_GREEN, rect)
+        elif tile_type == 10: # Tree Trunk
+            pygame.draw.rect(surface, GREEN, rect)
+            pygame.draw.rect(surface, BROWN, (x_pixel + TILE_SIZE//3, y_pixel, TILE_SIZE//3, TILE_SIZE))
+        elif tile_type == 11: # Tree Leaves
+            pygame.draw.rect(surface, GREEN, rect)
+            pygame.draw.circle(surface, DARK_GREEN, (x_pixel + TILE_SIZE // 2, y_pixel + TILE_SIZE // 2), TILE_SIZE // 2)
+        elif tile_type == 12: # Flowers
+            pygame.draw.rect(surface, GREEN, rect)
+            for fx, fy, color in ((4, 4, RED), (11, 6, WHITE), (6, 11, LIGHT_YELLOW), (12, 12, RED)):
+                pygame.draw.circle(surface, color, (x_pixel + fx * TILE_SIZE // 16, y_pixel + fy * TILE_SIZE // 16), 1)
 
-    def draw_map(self, surface):
-        start_tile_x = self.camera_x_tile
-        end_tile_x = start_tile_x + (self.map_display_width // TILE_SIZE) + 1
-        start_tile_y = self.camera_y_tile
-        end_tile_y = start_tile_y + (self.map_display_height // TILE_SIZE) + 1
+    def build_tile_atlas(self):
+        # Bake every tile type once; draw_map only blits these afterwards.
+        strip_size = (TILE_SIZE * TILE_TYPE_COUNT, TILE_SIZE)
+        if self.asset_cache is None:
+            strip = self.bake_tile_strip()
+        else:
+            strip = self.asset_cache.get_or_bake(self.tile_definition_key, strip_size, self.bake_tile_strip)
+        display_ready = pygame.display.get_surface() is not None
+        atlas = []
+        for tile_type in range(TILE_TYPE_COUNT):
+            tile_surface = strip.subsurface((tile_type * TILE_SIZE, 0, TILE_SIZE, TILE_SIZE)).copy()
+            atlas.append(tile_surface.convert() if display_ready else tile_surface)
+        return atlas
 
-        for r_idx in range(start_tile_y, min(end_tile_y, self.current_map_height_tiles)):
-            for c_idx in range(start_tile_x, min(end_tile_x, self.current_map_width_tiles)):
-                tile_val = self.current_map_data[r_idx][c_idx]
-                draw_x = (c_idx - self.camera_x_tile) * TILE_SIZE
-                draw_y = (r_idx - self.camera_y_tile) * TILE_SIZE
-                self.draw_tile(surface, tile_val, draw_x, draw_y)
+    def bake_tile_strip(self):
+        # All tile types side by side; each is clipped to its own cell like a standalone tile.
+        strip = pygame.Surface((TILE_SIZE * TILE_TYPE_COUNT, TILE_SIZE))
+        strip.fill(BLACK)
+        for tile_type in range(TILE_TYPE_COUNT):
+            strip.set_clip((tile_type * TILE_SIZE, 0, TILE_SIZE, TILE_SIZE))
+            self.draw_tile(strip, tile_type, tile_type * TILE_SIZE, 0)
+        strip.set_clip(None)
+        return strip
 
-    def draw_player(self, surface):
-        player_screen_x = (self.player_map_x_tile - self.camera_x_tile) * TILE_SIZE + (TILE_SIZE - PLAYER_SIZE) // 2
-        player_screen_y = (self.player_map_y_tile - self.camera_y_tile) * TILE_SIZE + (TILE_SIZE - PLAYER_SIZE) // 2
+    def draw_map(self, surface, area=None):
+        # area is in view coordinates; by default the whole viewport is redrawn.
+        area = self.map_canvas_rect if area is None else pygame.Rect(area)
+        surface.fill(BLACK, area)
+        source_rect = area.move(self.view[0], self.view[1])
+        surface.blit(self.kanto_maps[self.current_kanto_map_id]["surface"], area.topleft, source_rect)
+
+    def player_screen_rect(self):
+        camera_x, camera_y, player_x, player_y = self.view
+        player_screen_x = player_x - camera_x + (TILE_SIZE - PLAYER_SIZE) // 2
+        player_screen_y = player_y - camera_y + (TILE_SIZE - PLAYER_SIZE) // 2
         
         if player_screen_y < self.map_display_height and player_screen_y + PLAYER_SIZE > 0 and \
            player_screen_x < self.map_display_width and player_screen_x + PLAYER_SIZE > 0:
-            player_rect = pygame.Rect(player_screen_x, player_screen_y, PLAYER_SIZE, PLAYER_SIZE)
+            return pygame.Rect(player_screen_x, player_screen_y, PLAYER_SIZE, PLAYER_SIZE)
+        return None
+
+    def draw_player(self, surface):
+        player_rect = self.player_screen_rect()
+        if player_rect:
             pygame.draw.rect(surface, RED, player_rect)
             pygame.draw.rect(surface, BLACK, player_rect, 1)
 
     def draw_textbox(self):
-        box_rect = pygame.Rect(0, self.game_screen_height, SCREEN_WIDTH, TEXT_BOX_HEIGHT)
+        box_rect = self.textbox_rect
         pygame.draw.rect(self.screen, LIGHT_YELLOW, box_rect)
         pygame.draw.rect(self.screen, UI_BORDER_COLOR, box_rect, 3)
 
-        if self.current_textbox_message_lines:
-            for i, line in enumerate(self.current_textbox_message_lines):
-                if i <= self.textbox_line_index:
-                    text_surface = self.font.render(line, True, BLACK)
-                    self.screen.blit(text_surface, (15, self.game_screen_height + 15 + (i * (FONT_SIZE + 2))))
-            if self.textbox_line_index >= len(self.current_textbox_message_lines) - 1:
-                indicator_text = self.font.render("v (Z)", True, RED)
-                self.screen.blit(indicator_text, (SCREEN_WIDTH - 40, self.actual_screen_height - 25))
+        page = self.current_dialogue_page()
+        if page:
+            revealed = self.dialogue_revealed_chars()
+            self.draw_dialogue_reveal(page, 0, revealed)
+            if revealed == page.char_count:
+                self.draw_textbox_indicator()
+
+    def draw_dialogue_reveal(self, page, start_chars, end_chars):
+        # Typewriter step: copy just the newly uncovered strips of the pre-rendered page.
+        page_x, page_y = 15, self.game_screen_height + 15
+        return [self.screen.blit(page.surface, (page_x + area.x, page_y + area.y), area)
+                for area in page.reveal_rects(start_chars, end_chars)]
+
+    def draw_textbox_indicator(self):
+        indicator_text = self.text_cache.render(self.font, "v (Z)", RED)
+        return self.screen.blit(indicator_text, (SCREEN_WIDTH - 40, self.actual_screen_height - 25))
 
     def show_message(self, message):
-        self.textbox_message_queue.append(message)
+        self.textbox_message_queue.append(
+            paginate_text(message, self.font, SCREEN_WIDTH - 30, TEXT_BOX_LINES, FONT_SIZE + 2, BLACK, LIGHT_YELLOW))
         if not self.textbox_active:
             self._activate_next_message()
 
     def _activate_next_message(self):
         if self.textbox_message_queue:
-            message = self.textbox_message_queue.pop(0)
-            self.current_textbox_message_lines = wrap_text(message, self.font, SCREEN_WIDTH - 30)
-            self.textbox_line_index = 0
+            self.dialogue_pages = self.textbox_message_queue.popleft()
+            self.show_dialogue_page(0)
             self.game_state = STATE_TEXTBOX
             self.textbox_active = True
         else:
@@ -275,228 +573,609 @@ class RedEmuGame:
             if not self.battle_active:
                 self.game_state = STATE_OVERWORLD
 
+    def show_dialogue_page(self, index):
+        self.dialogue_page_index = index
+        self.dialogue_page_start_tick = self.tick_count
+
+    def current_dialogue_page(self):
+        return self.dialogue_pages[self.dialogue_page_index] if self.dialogue_pages else None
+
+    def dialogue_revealed_chars(self):
+        # Counted in game ticks, so the reveal replays exactly and Z means the same thing headless.
+        page = self.current_dialogue_page()
+        if page is None:
+            return 0
+        return min(page.char_count, (self.tick_count - self.dialogue_page_start_tick + 1) * TEXT_REVEAL_CHARS_PER_TICK)
+
+    def dialogue_revealing(self):
+        page = self.current_dialogue_page()
+        return page is not None and self.dialogue_revealed_chars() < page.char_count
+
     def handle_textbox_input(self, event):
         if event.key == pygame.K_z:
-            self.textbox_line_index += 1
-            if self.textbox_line_index >= len(self.current_textbox_message_lines):
+            if self.dialogue_revealing():
+                # Z while the page is still typing shows the rest of it at once.
+                self.dialogue_page_start_tick = self.tick_count - self.current_dialogue_page().char_count
+            elif self.dialogue_page_index + 1 < len(self.dialogue_pages):
+                self.show_dialogue_page(self.dialogue_page_index + 1)
+            else:
                 self._activate_next_message()
 
     def handle_overworld_input(self, event):
         new_player_map_x, new_player_map_y = self.player_map_x_tile, self.player_map_y_tile
         moved = False
-        direction_faced = None
 
         if event.key == pygame.K_LEFT:
             new_player_map_x -= 1
             moved = True
-            direction_faced = 'LEFT'
+            self.player_facing = 'LEFT'
         elif event.key == pygame.K_RIGHT:
             new_player_map_x += 1
             moved = True
-            direction_faced = 'RIGHT'
+            self.player_facing = 'RIGHT'
         elif event.key == pygame.K_UP:
             new_player_map_y -= 1
             moved = True
-            direction_faced = 'UP'
+            self.player_facing = 'UP'
         elif event.key == pygame.K_DOWN:
             new_player_map_y += 1
             moved = True
-            direction_faced = 'DOWN'
+            self.player_facing = 'DOWN'
         elif event.key == pygame.K_z:
-            tiles_to_check_for_interaction = [(self.player_map_x_tile, self.player_map_y_tile)]
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    if dx == 0 and dy == 0: continue
-                    tiles_to_check_for_interaction.append((self.player_map_x_tile + dx, self.player_map_y_tile + dy))
-            
-            interaction_triggered = False
-            for check_x, check_y in tiles_to_check_for_interaction:
-                map_coord_key = (self.current_kanto_map_id, check_x, check_y)
-                if map_coord_key in self.kanto_interactions:
-                    if 0 <= check_y < self.current_map_height_tiles and \
-                       0 <= check_x < self.current_map_width_tiles:
-                        tile_type_at_interaction = self.current_map_data[check_y][check_x]
-                        if tile_type_at_interaction in [7, 8]:
-                            self.show_message(self.kanto_interactions[map_coord_key])
-                            interaction_triggered = True
-                            break 
-            if interaction_triggered:
+            trigger = self.find_interaction_trigger()
+            if trigger:
+                self.show_message(trigger.message)
                 return
 
         if moved:
-            if 0 <= new_player_map_x < self.current_map_width_tiles and \
-               0 <= new_player_map_y < self.current_map_height_tiles:
+            if not (0 <= new_player_map_x < self.current_map_width_tiles and \
+                    0 <= new_player_map_y < self.current_map_height_tiles):
+                connection = self.kanto_maps[self.current_kanto_map_id]["connections"].get(EDGE_CONNECTIONS[self.player_facing])
+                if connection:
+                    self.change_map(connection)
+            else:
                 
-                target_tile_type = self.current_map_data[new_player_map_y][new_player_map_x]
-                impassable_tiles = [2, 3, 5, 6, 10, 11]
-                if target_tile_type not in impassable_tiles:
+                if self.current_passable[new_player_map_y, new_player_map_x]:
+                    # Logic moves a whole tile at once; only the drawing slides over WALK_TICKS.
+                    self.walk_from_view = self.interpolated_view(0.0)
+                    self.walk_start_tick = self.tick_count
                     self.player_map_x_tile = new_player_map_x
                     self.player_map_y_tile = new_player_map_y
                     self.center_camera_on_player()
 
-                    if target_tile_type in self.kanto_maps[self.current_kanto_map_id].get("encounter_tiles", [1, 9]):
-                        encounter_chance = 0.10
-                        if target_tile_type == 9:
-                            encounter_chance = 0.20
-                        if random.random() < encounter_chance:
-                            self.start_battle()
-                elif target_tile_type == 3:
+                    trigger = self.current_triggers.at(new_player_map_x, new_player_map_y)
+                    if trigger and (trigger.kind in STEP_TRIGGERS or trigger.target):
+                        self.fire_step_trigger(trigger)
+                        return
+
+                    encounter_chance = self.current_encounter_rate[new_player_map_y, new_player_map_x]
+                    if encounter_chance and self.rng.random() < encounter_chance:
+                        tile_type = self.current_map_data[new_player_map_y, new_player_map_x]
+                        self.start_battle(self.current_encounter_tables[tile_type])
+                elif self.current_map_data[new_player_map_y, new_player_map_x] == 3:
                     self.show_message("It's water. You can't walk on it.")
 
+    def find_interaction_trigger(self):
+        # The tile being faced wins; otherwise anything on or around the player still answers Z.
+        triggers = self.current_triggers
+        x, y = self.player_map_x_tile, self.player_map_y_tile
+        trigger = triggers.facing(x, y, self.player_facing)
+        if trigger and trigger.kind in INTERACT_TRIGGERS:
+            return trigger
+        for dx, dy in ((0, 0), (-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)):
+            trigger = triggers.at(x + dx, y + dy)
+            if trigger and trigger.kind in INTERACT_TRIGGERS:
+                return trigger
+        return None
+
+    def fire_step_trigger(self, trigger):
+        if trigger.target:
+            self.change_map(trigger.target)
+        elif trigger.kind == TRIGGER_STEP:
+            self.show_message(trigger.message)
+
     def change_map(self, connection_data):
-        pass
+        map_id, x, y = connection_data
+        self.walk_from_view = None  # Arrive without sliding in from the old map's coordinates
+        self.set_current_map(map_id)
+        self.player_map_x_tile = x
+        self.player_map_y_tile = y
+        self.center_camera_on_player()
 
-    def start_battle(self):
-        if not self.player_pokemon or self.player_pokemon["hp"] <= 0:
+    def start_battle(self, encounter_table):
+        if not self.player_pokemon or self.player_pokemon.hp <= 0:
             self.show_message("Your Pokemon is exhausted!")
             return
 
-        wild_pokemon_name = random.choice(list(POKEMON_DATA.keys()))
-        data = POKEMON_DATA[wild_pokemon_name]
-        self.enemy_pokemon = {
-            "name": wild_pokemon_name, "hp": data["hp"], "max_hp": data["max_hp"],
-            "attack": data["attack"], "defense": data["defense"], "sprite_color": data["sprite_color"]
-        }
+        species_id, level = encounter_table.sample(self.rng)
+        self.enemy_pokemon = Pokemon(species_id)
         self.game_state = STATE_BATTLE
         self.battle_active = True
         self.battle_turn = "player"
-        self.battle_message = f"A wild {self.enemy_pokemon['name']} appeared! Get ready to battle!"
-        self.last_battle_message_time = time.time()
+        self.battle_message = f"A wild {self.enemy_pokemon.name} (Lv. {level}) appeared! Get ready to battle!"
+        self.last_battle_message_time = self.game_time()
+
+    def battle_menu_visible(self):
+        return self.battle_turn == "player" and (self.game_time() - self.last_battle_message_time > 1.0)
 
     def draw_battle_ui(self):
         self.screen.fill(BLACK)
+        self.draw_battle_enemy_panel()
+        self.draw_battle_player_panel()
+        self.draw_battle_message_box()
 
+    def draw_battle_enemy_panel(self):
+        self.screen.fill(BLACK, self.battle_enemy_panel_rect)
         if self.enemy_pokemon:
-            enemy_name_surf = self.large_font.render(self.enemy_pokemon["name"], True, WHITE)
-            enemy_hp_surf = self.font.render(f"HP: {self.enemy_pokemon['hp']}/{self.enemy_pokemon['max_hp']}", True, WHITE)
-            pygame.draw.rect(self.screen, self.enemy_pokemon["sprite_color"], (SCREEN_WIDTH - 120, 50, 80, 80))
+            enemy_name_surf = self.text_cache.render(self.large_font, self.enemy_pokemon.name, WHITE)
+            enemy_hp_surf = self.text_cache.render(self.font, f"HP: {self.enemy_pokemon.hp}/{self.enemy_pokemon.max_hp}", WHITE)
+            pygame.draw.rect(self.screen, self.enemy_pokemon.sprite_color, (SCREEN_WIDTH - 120, 50, 80, 80))
             pygame.draw.rect(self.screen, WHITE, (SCREEN_WIDTH - 120, 50, 80, 80), 2)
             self.screen.blit(enemy_name_surf, (SCREEN_WIDTH - 150, 20))
             self.screen.blit(enemy_hp_surf, (SCREEN_WIDTH - 150, 20 + FONT_SIZE + 2))
+        return self.battle_enemy_panel_rect
 
+    def draw_battle_player_panel(self):
+        self.screen.fill(BLACK, self.battle_player_panel_rect)
         if self.player_pokemon:
-            player_name_surf = self.large_font.render(self.player_pokemon["name"], True, WHITE)
-            player_hp_surf = self.font.render(f"HP: {self.player_pokemon['hp']}/{self.player_pokemon['max_hp']}", True, WHITE)
-            pygame.draw.rect(self.screen, self.player_pokemon["sprite_color"], (40, self.actual_screen_height - 200, 80, 80))
+            player_name_surf = self.text_cache.render(self.large_font, self.player_pokemon.name, WHITE)
+            player_hp_surf = self.text_cache.render(self.font, f"HP: {self.player_pokemon.hp}/{self.player_pokemon.max_hp}", WHITE)
+            pygame.draw.rect(self.screen, self.player_pokemon.sprite_color, (40, self.actual_screen_height - 200, 80, 80))
             pygame.draw.rect(self.screen, WHITE, (40, self.actual_screen_height - 200, 80, 80), 2)
             self.screen.blit(player_name_surf, (30, self.actual_screen_height - 230))
             self.screen.blit(player_hp_surf, (30, self.actual_screen_height - 230 + FONT_SIZE + 2))
+        return self.battle_player_panel_rect
 
-        box_rect = pygame.Rect(0, self.game_screen_height, SCREEN_WIDTH, TEXT_BOX_HEIGHT)
+    def draw_battle_message_box(self):
+        box_rect = self.textbox_rect
         pygame.draw.rect(self.screen, LIGHT_YELLOW, box_rect)
         pygame.draw.rect(self.screen, UI_BORDER_COLOR, box_rect, 3)
 
         if self.battle_message:
             lines = wrap_text(self.battle_message, self.font, SCREEN_WIDTH - 30)
             for i, line in enumerate(lines[:2]):
-                text_surface = self.font.render(line, True, BLACK)
+                text_surface = self.text_cache.render(self.font, line, BLACK)
                 self.screen.blit(text_surface, (15, self.game_screen_height + 15 + (i * (FONT_SIZE + 2))))
 
-        if self.battle_turn == "player" and (time.time() - self.last_battle_message_time > 1.0):
-            fight_text = self.font.render("1. FIGHT", True, BLACK)
-            run_text = self.font.render("2. RUN", True, BLACK)
+        if self.battle_menu_visible():
+            fight_text = self.text_cache.render(self.font, "1. FIGHT", BLACK)
+            run_text = self.text_cache.render(self.font, "2. RUN", BLACK)
             self.screen.blit(fight_text, (SCREEN_WIDTH // 2 - 100, self.game_screen_height + 20))
             self.screen.blit(run_text, (SCREEN_WIDTH // 2 - 100, self.game_screen_height + 20 + FONT_SIZE + 5))
+        return box_rect
 
     def handle_battle_input(self, event):
-        if self.battle_turn == "player" and (time.time() - self.last_battle_message_time > 1.0):
+        if self.battle_menu_visible():
             if event.key == pygame.K_1:
                 self.execute_player_attack()
             elif event.key == pygame.K_2:
                 self.battle_message = "You ran away! Smart move, maybe."
-                self.last_battle_message_time = time.time()
-                pygame.time.set_timer(pygame.USEREVENT + 1, 1500, True)
+                self.last_battle_message_time = self.game_time()
+                self.battle_turn = "over"  # No more menu; just wait for the battle to close
+                self.after_ms(1500, self.end_battle, key="battle_end")
 
     def execute_player_attack(self):
         if not self.player_pokemon or not self.enemy_pokemon: return
 
-        damage = max(1, self.player_pokemon["attack"] - self.enemy_pokemon["defense"] // 2 + random.randint(-2, 2))
-        self.enemy_pokemon["hp"] = max(0, self.enemy_pokemon["hp"] - damage)
-        self.battle_message = f"{self.player_pokemon['name']} attacks {self.enemy_pokemon['name']}! Did {damage} damage!"
-        self.last_battle_message_time = time.time()
+        damage = apply_attack(self.player_pokemon, self.enemy_pokemon, self.rng)
+        self.battle_message = f"{self.player_pokemon.name} attacks {self.enemy_pokemon.name}! Did {damage} damage!"
+        self.last_battle_message_time = self.game_time()
 
-        if self.enemy_pokemon["hp"] <= 0:
-            self.battle_message = f"Enemy {self.enemy_pokemon['name']} fainted! You win!"
-            pygame.time.set_timer(pygame.USEREVENT + 1, 2000, True)
+        if self.enemy_pokemon.hp <= 0:
+            self.battle_message = f"Enemy {self.enemy_pokemon.name} fainted! You win!"
+            self.battle_turn = "over"
+            self.after_ms(2000, self.end_battle, key="battle_end")
         else:
             self.battle_turn = "enemy_pending_message"
-            pygame.time.set_timer(pygame.USEREVENT + 2, 1500, True)
+            self.after_ms(1500, self.take_enemy_turn, key="enemy_turn")
 
     def execute_enemy_attack(self):
         if not self.player_pokemon or not self.enemy_pokemon: return
 
-        damage = max(1, self.enemy_pokemon["attack"] - self.player_pokemon["defense"] // 2 + random.randint(-2, 2))
-        self.player_pokemon["hp"] = max(0, self.player_pokemon["hp"] - damage)
-        self.battle_message = f"Wild {self.enemy_pokemon['name']} attacks! Did {damage} damage to your {self.player_pokemon['name']}!"
-        self.last_battle_message_time = time.time()
+        damage = apply_attack(self.enemy_pokemon, self.player_pokemon, self.rng)
+        self.battle_message = f"Wild {self.enemy_pokemon.name} attacks! Did {damage} damage to your {self.player_pokemon.name}!"
+        self.last_battle_message_time = self.game_time()
 
-        if self.player_pokemon["hp"] <= 0:
-            self.battle_message = f"Your {self.player_pokemon['name']} fainted! You lost!"
-            pygame.time.set_timer(pygame.USEREVENT + 1, 2000, True)
+        if self.player_pokemon.hp <= 0:
+            self.battle_message = f"Your {self.player_pokemon.name} fainted! You lost!"
+            self.battle_turn = "over"
+            self.after_ms(2000, self.end_battle, key="battle_end")
         else:
             self.battle_turn = "player"
 
+    def take_enemy_turn(self):
+        if self.battle_turn == "enemy_pending_message":
+            self.battle_turn = "enemy"
+            self.execute_enemy_attack()
+
     def end_battle(self):
         self.battle_active = False
         self.enemy_pokemon = None
         self.game_state = STATE_OVERWORLD
         self.battle_message = ""
-        if self.player_pokemon and self.player_pokemon["hp"] > 0:
-            self.player_pokemon["hp"] = min(self.player_pokemon["max_hp"], self.player_pokemon["hp"] + random.randint(3,8))
-            self.show_message(f"{self.player_pokemon['name']} feels a bit better.")
-        elif self.player_pokemon and self.player_pokemon["hp"] <= 0:
+        if self.player_pokemon and self.player_pokemon.hp > 0:
+            self.player_pokemon.hp = min(self.player_pokemon.max_hp, self.player_pokemon.hp + self.rng.randint(3,8))
+            self.show_message(f"{self.player_pokemon.name} feels a bit better.")
+        elif self.player_pokemon and self.player_pokemon.hp <= 0:
             self.show_message("You should take your Pokemon to a PokeCenter.")
 
+    def render_frame(self, alpha=0.0):
+        # Redraw only the layers whose inputs changed since the last frame and
+        # record their rectangles so present() pushes just those pixels.
+        self.view = self.interpolated_view(alpha)
+        if self.game_state == STATE_BATTLE:
+            self.render_battle_frame()
+        else:
+            self.render_overworld_frame()
+
+    def render_overworld_frame(self):
+        last = self.last_frame_keys
+        if last.get("scene") != STATE_OVERWORLD:
+            last.clear()
+            last["scene"] = STATE_OVERWORLD
+            self.dirty_regions.mark_all()
+
+        map_key = (self.current_kanto_map_id, self.view[0], self.view[1], self.map_version)
+        player_rect = self.player_screen_rect()
+        if last.get("map") != map_key:
+            self.draw_map(self.map_canvas)
+            self.draw_player(self.map_canvas)
+            self.dirty_regions.mark(self.map_canvas_rect)
+        elif last.get("player") != player_rect:
+            old_player_rect = last.get("player")
+            if old_player_rect:
+                self.draw_map(self.map_canvas, old_player_rect)
+                self.dirty_regions.mark(old_player_rect)
+            if player_rect:
+                self.draw_player(self.map_canvas)
+                self.dirty_regions.mark(player_rect)
+        last["map"] = map_key
+        last["player"] = player_rect
+
+        page = self.current_dialogue_page()
+        revealed = self.dialogue_revealed_chars()
+        last_page, last_revealed = last.get("textbox", (None, None))
+        if page is not None and page is last_page and revealed > last_revealed:
+            # Same page, more of it showing: only the newly typed strip changes.
+            for rect in self.draw_dialogue_reveal(page, last_revealed, revealed):
+                self.dirty_regions.mark(rect)
+            if revealed == page.char_count:
+                self.dirty_regions.mark(self.draw_textbox_indicator())
+        elif "textbox" not in last or (page, revealed) != (last_page, last_revealed):
+            self.draw_textbox()
+            self.dirty_regions.mark(self.textbox_rect)
+        last["textbox"] = (page, revealed)
+
+    def render_battle_frame(self):
+        last = self.last_frame_keys
+        enemy_key = (self.enemy_pokemon.name, self.enemy_pokemon.hp) if self.enemy_pokemon else None
+        player_key = (self.player_pokemon.name, self.player_pokemon.hp) if self.player_pokemon else None
+        box_key = (self.battle_message, self.battle_menu_visible())
+
+        if last.get("scene") != STATE_BATTLE:
+            last.clear()
+            last["scene"] = STATE_BATTLE
+            self.draw_battle_ui()
+            self.dirty_regions.mark_all()
+        else:
+            if last.get("enemy") != enemy_key:
+                self.dirty_regions.mark(self.draw_battle_enemy_panel())
+            if last.get("player") != player_key:
+                self.dirty_regions.mark(self.draw_battle_player_panel())
+            if last.get("box") != box_key:
+                self.dirty_regions.mark(self.draw_battle_message_box())
+        last["enemy"] = enemy_key
+        last["player"] = player_key
+        last["box"] = box_key
+
+    def game_time(self):
+        return self.tick_count / TICK_RATE
+
+    def after_ms(self, delay_ms, callback, *args, key=None):
+        # Delays count game ticks rather than wall time so headless runs can go flat out.
+        return self.scheduler.schedule(ticks_for_ms(delay_ms, TICK_RATE), callback, *args, key=key)
+
+    def next_wakeup_time(self):
+        # Earliest perf_counter moment at which the frame can change without input.
+        next_due_tick = self.scheduler.next_due_tick()
+        wakeup_ticks = [] if next_due_tick is None else [next_due_tick]
+        if self.game_state == STATE_BATTLE and self.battle_turn == "player" and not self.battle_menu_visible():
+            wakeup_ticks.append(int((self.last_battle_message_time + 1.0) * TICK_RATE) + 1)
+        if self.dialogue_revealing():
+            wakeup_ticks.append(self.tick_count + 1)  # The next characters type on the next tick
+        wakeups = [self.frame_clock.time_of_tick(tick - self.tick_count) for tick in wakeup_ticks]
+        if self.walking():
+            wakeups.append(time.perf_counter())  # Keep drawing frames until the step has slid into place
+        if not self.hq_ripper_cycle_announced:
+            wakeups.append(self.hq_ripper_deadline)
+        if self.save_writer is not None:
+            wakeups.append(self.next_autosave_time)
+        if self.profile_overlay_deadline is not None:
+            wakeups.append(self.profile_overlay_deadline)
+        return min(wakeups) if wakeups else None
+
+    def open_save(self, path):
+        """Restores the save at path if there is one, then autosaves to it in the background."""
+        sections = load_save(path)
+        for record in sections.get(b"MAPS", []):
+            map_id, edits = decode_map_edits(record)
+            if self.has_kanto_map(map_id):
+                self.get_kanto_map(map_id)
+                for (x, y), tile_type in edits.items():
+                    self.set_map_tile(map_id, x, y, tile_type)
+        for record in sections.get(b"PLYR", []):
+            map_id, x, y, facing = decode_player(record)
+            if self.has_kanto_map(map_id):
+                self.change_map((map_id, x, y))
+                self.player_facing = facing
+        for record in sections.get(b"PRTY", []):
+            party = decode_party(record)
+            if len(party):
+                self.player_pokemon = party[0]
+        if sections:
+            print(f"CATSDK: Loaded save {path}")
+        # Nothing from the file is kept, so the first save writes everything again.
+        self.dirty_map_edits = set(self.map_edits)
+        self.saved_state = {}
+        self.save_writer = SaveWriter(path, SAVE_ENCODERS)
+        self.next_autosave_time = time.perf_counter() + AUTOSAVE_INTERVAL_SECONDS
+
+    def autosave(self):
+        """Snapshots what changed since the last save and hands it to the save thread.
+
+        Nothing large is copied here: changed maps hand their edit dicts over
+        as they are, and set_map_tile copies a map's dict the next time it
+        edits that map. Encoding and writing run on the
+        SaveWriter's thread, so this takes the same time however big the world is.
+        """
+        changes = {}
+        player = (self.current_kanto_map_id, self.player_map_x_tile, self.player_map_y_tile, self.player_facing)
+        if self.saved_state.get(b"PLYR") != player:
+            changes[b"PLYR"] = {None: player}
+            self.saved_state[b"PLYR"] = player
+        party = (self.player_pokemon.species_id, self.player_pokemon.hp) if self.player_pokemon else None
+        if party and self.saved_state.get(b"PRTY") != party:
+            box = PokemonBox()
+            box.deposit(self.player_pokemon)
+            changes[b"PRTY"] = {None: box}
+            self.saved_state[b"PRTY"] = party
+        if self.dirty_map_edits:
+            changes[b"MAPS"] = {map_id: self.map_edits[map_id] for map_id in self.dirty_map_edits}
+            self.shared_map_edits |= self.dirty_map_edits
+            self.dirty_map_edits = set()
+        self.next_autosave_time = time.perf_counter() + AUTOSAVE_INTERVAL_SECONDS
+        return self.save_writer.save(changes) if changes else None
+
+    def close_save(self):
+        if self.save_writer is not None:
+            self.autosave()
+            self.save_writer.close()
+
+    def run_scheduled_wakeups(self):
+        if not self.hq_ripper_cycle_announced and time.perf_counter() >= self.hq_ripper_deadline:
+            self.hq_ripper_cycle_announced = True
+            print("CATSDK: Meow... Work cycle complete. Set a new timer if you want more Kanto!")
+        if self.save_writer is not None and time.perf_counter() >= self.next_autosave_time:
+            self.autosave()
+
+    def poll_events(self):
+        events = pygame.event.get()
+        # Nothing queued and the last frame is already on screen: sleep until the
+        # next event or scheduled wakeup instead of spinning at the frame cap.
+        if events or not self.idle_wait_enabled or not self.last_frame_keys:
+            return events
+        timeout_ms = IDLE_WAIT_MAX_MS
+        wakeup = self.next_wakeup_time()
+        if wakeup is not None:
+            timeout_ms = max(1, min(IDLE_WAIT_MAX_MS, int((wakeup - time.perf_counter()) * 1000) + 1))
+        wait_start = time.perf_counter()
+        event = pygame.event.wait(timeout_ms)
+        waited = time.perf_counter() - wait_start
+        self.frame_clock.add_idle_time(waited)
+        self.profiler.add("idle", waited)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def handle_event(self, event):
+        """Dispatches one event; returns False when the game should stop."""
+        if event.type == pygame.QUIT:
+            return False
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            self.toggle_profile_overlay()  # A debug key: never recorded, never game input
+            return True
+        if event.type == pygame.KEYDOWN:
+            if self.input_recording is not None:
+                self.input_recording.record(self.tick_count, event.key)
+            if self.game_state == STATE_OVERWORLD:
+                if not self.textbox_active:
+                   self.handle_overworld_input(event)
+                else:
+                   self.handle_textbox_input(event)
+            elif self.game_state == STATE_TEXTBOX:
+                self.handle_textbox_input(event)
+            elif self.game_state == STATE_BATTLE:
+                self.handle_battle_input(event)
+        return True
+
+    def toggle_profile_overlay(self):
+        if self.profile_overlay_deadline is None:
+            if self.profile_overlay_font is None:
+                self.profile_overlay_font = pygame.font.SysFont("monospace", OVERLAY_FONT_SIZE)
+            self.profile_overlay_deadline = time.perf_counter()
+        else:
+            self.profile_overlay_deadline = None
+            self.profile_overlay = None
+            self.last_frame_keys.clear()  # Redraw what the overlay covered
+
+    def draw_profile_overlay(self):
+        if self.profile_overlay_deadline is None:
+            return
+        now = time.perf_counter()
+        if now >= self.profile_overlay_deadline:
+            overlay = render_overlay(self.profiler, self.profile_overlay_font)
+            if self.profile_overlay is not None and overlay.get_size() != self.profile_overlay.get_size():
+                # The overlay shrank or grew: repaint the whole frame under the new one.
+                self.last_frame_keys.clear()
+                self.render_frame(self.frame_clock.alpha)
+            self.profile_overlay = overlay
+            self.profile_overlay_deadline = now + OVERLAY_REFRESH_SECONDS
+            self.dirty_regions.mark(self.screen.blit(overlay, (4, 4)))
+        else:
+            # Opaque, so blitting it again over whatever this frame redrew is always
+            # safe; any redrawn region touching it is already being presented.
+            self.screen.blit(self.profile_overlay, (4, 4))
+
     def run(self):
         running = True
-        map_surface = pygame.Surface((self.map_display_width, self.map_display_height))
+        profiler = self.profiler
+        profiler.instrument(self, {
+            "handle_overworld_input": "input", "handle_textbox_input": "input", "handle_battle_input": "input",
+            "draw_map": "draw_map", "draw_player": "draw_player", "draw_textbox": "draw_textbox",
+            "draw_dialogue_reveal": "draw_textbox",
+            "draw_battle_ui": "draw_battle", "draw_battle_enemy_panel": "draw_battle",
+            "draw_battle_player_panel": "draw_battle", "draw_battle_message_box": "draw_battle",
+        })
 
         while running:
-            current_time = time.time()
-            if current_time - self.hq_ripper_start_time > self.hq_ripper_work_duration_seconds:
-                print("CATSDK: Meow... Work cycle complete. Set a new timer if you want more Kanto!")
-                
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                if event.type == pygame.KEYDOWN:
-                    if self.game_state == STATE_OVERWORLD:
-                        if not self.textbox_active:
-                           self.handle_overworld_input(event)
-                        else:
-                           self.handle_textbox_input(event)
-                    elif self.game_state == STATE_TEXTBOX:
-                        self.handle_textbox_input(event)
-                    elif self.game_state == STATE_BATTLE:
-                        self.handle_battle_input(event)
-
-                if event.type == pygame.USEREVENT + 1:
-                    self.end_battle()
-                    pygame.time.set_timer(pygame.USEREVENT + 1, 0)
-                if event.type == pygame.USEREVENT + 2:
-                    if self.battle_turn == "enemy_pending_message":
-                        self.battle_turn = "enemy"
-                        self.execute_enemy_attack()
-                    pygame.time.set_timer(pygame.USEREVENT + 2, 0)
-
-            self.screen.fill(BLACK)
-
-            if self.game_state == STATE_OVERWORLD or self.game_state == STATE_TEXTBOX:
-                map_surface.fill(BLACK)
-                self.draw_map(map_surface)
-                self.draw_player(map_surface)
-                self.screen.blit(map_surface, (0,0))
-                self.draw_textbox()
+            profiler.begin_frame()
+            self.run_scheduled_wakeups()
 
-            elif self.game_state == STATE_BATTLE:
-                self.draw_battle_ui()
+            with profiler.phase("events"):
+                events = self.poll_events()
+            # Run every tick that fell due since the last frame, one at a time,
+            # so timers fire on exactly the tick they were due, as they would
+            # in a headless replay.
+            with profiler.phase("logic"):
+                for _ in range(self.frame_clock.advance()):
+                    self.tick_count += 1
+                    self.scheduler.run_until(self.tick_count)
+                for event in events:
+                    running = self.handle_event(event) and running
 
-            pygame.display.flip()
-            self.clock.tick(30)
+            with profiler.phase("render"):
+                self.render_frame(self.frame_clock.alpha)
+                self.draw_profile_overlay()
+            with profiler.phase("present"):
+                self.dirty_regions.present()
+            with profiler.phase("sleep"):
+                self.frame_clock.end_frame()
 
+        if self.profile_dump_path:
+            profiler.dump(self.profile_dump_path)
+            print(f"CATSDK: Wrote frame profile ({profiler.frame_count} frames) to {self.profile_dump_path}")
+        if self.input_recording is not None:
+            self.input_recording.finish(self.tick_count, self.state_digest())
+        self.close_save()
+        self.map_prefetcher.shutdown(wait=False, cancel_futures=True)
         pygame.quit()
         print("CATSDK: Game over! Hope you enjoyed Kanto!")
 
+    def state_digest(self):
+        """SHA-1 over the game state a replay must reproduce (wall-clock fields excluded)."""
+        state = (
+            self.current_kanto_map_id, self.player_map_x_tile, self.player_map_y_tile,
+            self.camera_x_tile, self.camera_y_tile, self.game_state,
+            list(self.textbox_message_queue), self.dialogue_pages, self.dialogue_page_index,
+            self.dialogue_page_start_tick,
+            self.battle_active, self.battle_turn, self.battle_message, self.last_battle_message_time,
+            self.player_pokemon, self.enemy_pokemon, self.scheduler.snapshot(),
+            self.rng.getstate(),
+        )
+        digest = hashlib.sha1(repr(state).encode())
+        for map_id in sorted(self.kanto_maps):
+            digest.update(self.kanto_maps[map_id]["map"].tobytes())
+        return digest.digest()
+
+    def run_headless(self, input_script, max_ticks=None, render=True):
+        """Runs the game flat out from a scripted input stream and returns ticks per second.
+
+        input_script yields, for every tick, a (possibly empty) sequence of keys
+        pressed on that tick. Game time advances one tick per step regardless
+        of how long the step took, so timers and battle pacing run as fast as
+        the CPU allows.
+        """
+        start = time.perf_counter()
+        ticks_run = 0
+        for keys in input_script:
+            if max_ticks is not None and ticks_run >= max_ticks:
+                break
+            self.scheduler.run_until(self.tick_count)
+            events = [pygame.event.Event(pygame.KEYDOWN, key=key) for key in keys]
+            if not all([self.handle_event(event) for event in events]):
+                break
+            if render:
+                self.render_frame()
+                self.dirty_regions.discard()
+            self.tick_count += 1
+            ticks_run += 1
+        elapsed = time.perf_counter() - start
+        return ticks_run / elapsed if elapsed > 0 else float("inf")
+
+def random_input_script(seed, ticks, press_chance=0.5):
+    """Endless-soak input: a random key (or nothing) on each tick."""
+    keys = [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_z, pygame.K_1, pygame.K_2]
+    script_rng = random.Random(seed)
+    for _ in range(ticks):
+        yield [script_rng.choice(keys)] if script_rng.random() < press_chance else []
+
 if __name__ == '__main__':
-    game = RedEmuGame()
-    game.run()
+    parser = argparse.ArgumentParser(description="RedEMU Kanto")
+    parser.add_argument("--headless", action="store_true", help="run without a window from a scripted random input stream")
+    parser.add_argument("--ticks", type=int, default=100000, help="number of ticks to simulate in headless mode")
+    parser.add_argument("--seed", type=int, default=None, help="game seed (and headless input script seed)")
+    parser.add_argument("--no-render", action="store_true", help="skip frame composition in headless mode")
+    parser.add_argument("--record", metavar="PATH", help="record this session's inputs for replay")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recorded session headless at full speed")
+    parser.add_argument("--map-pack", metavar="PATH", help="load maps from a binary map pack instead of the built-in tables")
+    parser.add_argument("--no-asset-cache", action="store_true",
+                        help="always bake tiles and map backgrounds instead of using the on-disk cache")
+    parser.add_argument("--fps", type=int, choices=RENDER_RATES, default=DEFAULT_RENDER_FPS,
+                        help="frame rate cap for the window (0 = uncapped); logic always runs at TICK_RATE")
+    parser.add_argument("--speed", type=float, default=1.0, help="game speed relative to real time in the window")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write frame-phase timings to PATH on exit (CSV if it ends in .csv, JSON otherwise)")
+    parser.add_argument("--save", metavar="PATH",
+                        help="load this save file if it exists, autosave to it while playing and on exit")
+    parser.add_argument("--build-map-pack", metavar="PATH", help="write the built-in Kanto maps to a binary map pack and exit")
+    args = parser.parse_args()
+    if args.record and args.save:
+        # A recording holds only the seed and the keys, so state loaded from a save could not be replayed.
+        parser.error("--record can't be combined with --save")
+
+    if args.build_map_pack:
+        write_map_pack(args.build_map_pack, KANTO_MAP_DEFS, KANTO_TRIGGERS)
+        print(f"CATSDK: Wrote {len(KANTO_MAP_DEFS)} maps to {args.build_map_pack}")
+    elif args.replay:
+        recording = InputRecording.load(args.replay)
+        game = RedEmuGame(headless=True, seed=recording.seed, map_pack=args.map_pack, asset_cache=not args.no_asset_cache)
+        ticks_per_second = game.run_headless(recording.input_script(), render=not args.no_render)
+        matched = game.state_digest() == recording.final_digest
+        print(f"CATSDK: Replayed {recording.end_tick + 1} ticks at {ticks_per_second:.0f} ticks/s, "
+              f"final state {'matches' if matched else 'DIVERGED from'} the recording")
+        pygame.quit()
+    elif args.headless:
+        game = RedEmuGame(headless=True, seed=args.seed, map_pack=args.map_pack, asset_cache=not args.no_asset_cache)
+        if args.save:
+            game.open_save(args.save)
+        if args.record:
+            game.input_recording = InputRecording(game.seed)
+        script_seed = game.seed if args.seed is None else args.seed
+        ticks_per_second = game.run_headless(random_input_script(script_seed, args.ticks), render=not args.no_render)
+        game.close_save()
+        print(f"CATSDK: Headless run done, {game.tick_count} ticks at {ticks_per_second:.0f} ticks/s")
+        if args.record:
+            game.input_recording.finish(game.tick_count - 1, game.state_digest())
+            game.input_recording.save(args.record)
+        pygame.quit()
+    else:
+        game = RedEmuGame(seed=args.seed, map_pack=args.map_pack, asset_cache=not args.no_asset_cache,
+                          render_fps=args.fps, time_scale=args.speed)
+        game.profile_dump_path = args.profile
+        if args.save:
+            game.open_save(args.save)
+        if args.record:
+            game.input_recording = InputRecording(game.seed)
+        game.run()
+        if args.record:
+            game.input_recording.save(args.record)
@@ -1,7 +1,23 @@
+import argparse
+from collections import deque
+import hashlib
+import numpy as np
 import pygame
 import random
 import time
 
+from redemu_battle import Pokemon, PokemonBox, apply_attack
+from redemu_clock import RENDER_RATES, FixedStepClock
+from redemu_display import DirtyRegions
+from redemu_encounters import compile_encounters
+from redemu_profile import OVERLAY_FONT_SIZE, OVERLAY_REFRESH_SECONDS, FrameProfiler, render_overlay
+from redemu_replay import InputRecording
+from redemu_save import (SaveWriter, decode_chunk_edits, decode_party, decode_player, decode_world, encode_chunk_edits,
+                         encode_party, encode_player, encode_world, load_save)
+from redemu_scheduler import TickScheduler, ticks_for_ms
+from redemu_text import TextSurfaceCache, paginate_text, wrap_text
+from redemu_worldgen import ChunkWorld
+
 # --- Configuration ---
 SCREEN_WIDTH = 480  # Screen width in pixels
 SCREEN_HEIGHT = 320  # Screen height in pixels
@@ -9,6 +25,13 @@ TILE_SIZE = 16      # Size of each tile in pixels
 PLAYER_SIZE = 12    # Size of the player
 TEXT_BOX_HEIGHT = 80  # Height for dialogue/battle box
 FONT_SIZE = 18      # Font size for text
+TICK_RATE = 30      # Game logic ticks per second of game time
+DEFAULT_RENDER_FPS = 60  # Frame cap; 0 renders as fast as possible
+WALK_TICKS = 4      # Ticks the view takes to scroll one tile
+TEXT_BOX_LINES = 3  # Lines of dialogue per textbox page
+TEXT_REVEAL_CHARS_PER_TICK = 2  # Typewriter speed
+AUTOSAVE_INTERVAL_SECONDS = 30  # Real time between background autosaves
+SAVE_ENCODERS = {b"WRLD": encode_world, b"PLYR": encode_player, b"PRTY": encode_party, b"CHNK": encode_chunk_edits}
 
 # --- Colors (RGB) ---
 BLACK = (0, 0, 0)
@@ -33,55 +56,74 @@ STATE_TEXTBOX = "textbox"  # For simple messages
 # 2: Wall/Obstacle (Grey)
 # 3: Water (Water Blue)
 # 4: NPC_BLOCK (Looks like a path, but triggers text)
+# The world is endless and chunked; MAP_WIDTH x MAP_HEIGHT is the visible window onto it.
 MAP_WIDTH = SCREEN_WIDTH // TILE_SIZE
 MAP_HEIGHT = (SCREEN_HEIGHT - TEXT_BOX_HEIGHT) // TILE_SIZE  # Adjust map height for text box
+CHUNK_PREFETCH_RADIUS = 1  # Chunks around the player's chunk generated ahead of time
+SPAWN_SEARCH_CHUNKS = 64   # How far east along row 0 to look for an open spawn point
 
 game_map = [[2 for _ in range(MAP_WIDTH)] for _ in range(MAP_HEIGHT)]
 
-# --- Placeholder Pokemon Data ---
-# Structure: name, hp, attack, defense, "sprite" (color for now)
-POKEMON_DATA = {
-    "KITTENPUNCH": {"hp": 30, "max_hp": 30, "attack": 8, "defense": 5, "sprite_color": (255, 105, 180)},  # Pink
-    "BARKBITE": {"hp": 35, "max_hp": 35, "attack": 7, "defense": 6, "sprite_color": (160, 82, 45)},       # Sienna
-    "PIXELPUP": {"hp": 25, "max_hp": 25, "attack": 9, "defense": 4, "sprite_color": (173, 216, 230)}      # Light Blue
+# --- Wild Encounters ---
+# Per tile type: (chance per step, ((species, weight, min level, max level), ...)); the world is one map.
+WORLD_ENCOUNTERS = {
+    1: (0.15, (("KITTENPUNCH", 40, 2, 5), ("BARKBITE", 35, 2, 5), ("PIXELPUP", 25, 3, 6))),  # Grass
 }
 
-# --- Simple Text Wrapping ---
-def wrap_text(text, font, max_width):
-    """Wraps text to fit a specified width."""
-    words = text.split(' ')
-    lines = []
-    current_line = ""
-    for word in words:
-        test_line = current_line + word + " "
-        if font.size(test_line)[0] <= max_width:
-            current_line = test_line
-        else:
-            lines.append(current_line.strip())
-            current_line = word + " "
-    lines.append(current_line.strip())
-    return lines
-
 class RedEmuGame:
-    def __init__(self):
+    def __init__(self, seed=None, render_fps=DEFAULT_RENDER_FPS, time_scale=1.0, save_path=None, headless=False):
         pygame.init()
+        # A save brings its own world seed, so it has to be read before the world is made
+        saved = load_save(save_path) if save_path else {}
+        if b"WRLD" in saved:
+            seed = decode_world(saved[b"WRLD"][0])
+        # All randomness (map, encounters, damage) comes from this seeded generator
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.input_recording = None
         # Screen setup considering the text box
         self.actual_screen_height = SCREEN_HEIGHT
         self.game_screen_height = SCREEN_HEIGHT - TEXT_BOX_HEIGHT
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, self.actual_screen_height))
-        pygame.display.set_caption("RedEMU Test")
-        self.clock = pygame.time.Clock()
+        if headless:
+            # Replays run without a window: frames are composed but never presented
+            self.screen = pygame.Surface((SCREEN_WIDTH, self.actual_screen_height))
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, self.actual_screen_height))
+            pygame.display.set_caption("RedEMU Test")
+        self.map_rect = pygame.Rect(0, 0, SCREEN_WIDTH, self.game_screen_height)
+        # Whole tiles around the view are composed here, then the visible window is copied out
+        self.map_canvas = pygame.Surface(((MAP_WIDTH + 1) * TILE_SIZE, (MAP_HEIGHT + 1) * TILE_SIZE))
+        self.textbox_rect = pygame.Rect(0, self.game_screen_height, SCREEN_WIDTH, TEXT_BOX_HEIGHT)
+        self.battle_enemy_panel_rect = pygame.Rect(SCREEN_WIDTH - 150, 20, 150, 112)
+        self.battle_player_panel_rect = pygame.Rect(30, self.actual_screen_height - 230, 150, 112)
+        self.dirty_regions = DirtyRegions(self.screen.get_rect())  # Tracks what changed since the last present
+        self.last_frame_keys = {}
+        # Logic runs in fixed ticks; frames are drawn at render_fps and interpolate between ticks
+        self.frame_clock = FixedStepClock(TICK_RATE, render_fps, time_scale)
+        self.tick_count = 0
+        self.scheduler = TickScheduler()  # Battle pacing callbacks, on game ticks
+        self.walk_from_view = None
+        self.walk_start_tick = 0
         self.font = pygame.font.Font(None, FONT_SIZE)  # Default font
         self.large_font = pygame.font.Font(None, FONT_SIZE + 6)  # For battle names
+        self.text_cache = TextSurfaceCache()  # Shared by the textbox and battle UI
+        self.profiler = FrameProfiler()  # Frame-phase timings, shown with F3
+        self.profile_dump_path = None
+        self.profile_overlay = None
+        self.profile_overlay_font = None
+        self.profile_overlay_deadline = None
 
         self.game_state = STATE_OVERWORLD
-        self.current_map = [[2 for _ in range(MAP_WIDTH)] for _ in range(MAP_HEIGHT)]
-        self.player_x_tile = MAP_WIDTH // 2
-        self.player_y_tile = MAP_HEIGHT // 2
-
-        self.textbox_message_queue = []  # Messages to display
-        self.current_textbox_message_lines = []
-        self.textbox_line_index = 0
+        self.world = ChunkWorld(self.seed)  # Chunks depend only on (seed, chunk x, chunk y)
+        self.world.restore_overrides(dict(decode_chunk_edits(record) for record in saved.get(b"CHNK", [])))
+        self.encounter_tables = compile_encounters(WORLD_ENCOUNTERS)  # Indexed by tile type
+        self.player_x_tile = 0  # World tile coordinates
+        self.player_y_tile = 0
+
+        self.textbox_message_queue = deque()  # Messages to display, already split into rendered pages
+        self.dialogue_pages = []  # Pages of the message being shown
+        self.dialogue_page_index = 0
+        self.dialogue_page_start_tick = 0  # Tick the current page started typing
         self.textbox_active = False
 
         self.battle_active = False
@@ -93,45 +135,72 @@ class RedEmuGame:
 
         self.generate_procedural_map()
         self.setup_player_pokemon()  # Give player a starting Pokemon
+        self.view = self.logical_view()
 
         # Add a simple NPC
-        self.current_map[self.player_y_tile - 2][self.player_x_tile] = 4  # NPC tile
+        self.world.set_tile(self.player_x_tile, self.player_y_tile - 2, 4)  # NPC tile
         self.npc_data = {
             (self.player_x_tile, self.player_y_tile - 2): "I'm a test NPC! Have you seen my cat, Pixelpup?"
         }
 
+        # --- Saving ---
+        for record in saved.get(b"PLYR", []):
+            _, self.player_x_tile, self.player_y_tile, _ = decode_player(record)
+            self.world.prefetch_around(self.player_x_tile, self.player_y_tile, CHUNK_PREFETCH_RADIUS)
+            self.view = self.logical_view()
+        for record in saved.get(b"PRTY", []):
+            party = decode_party(record)
+            if len(party):
+                self.player_pokemon = party[0]
+        if saved:
+            print(f"CATSDK: Loaded save {save_path}")
+        self.save_writer = SaveWriter(save_path, SAVE_ENCODERS) if save_path else None
+        self.saved_state = {}  # What the last autosave wrote, to skip unchanged records
+        self.next_autosave_time = time.perf_counter() + AUTOSAVE_INTERVAL_SECONDS
+
     def setup_player_pokemon(self):
         """Gives the player a starting Pokemon."""
-        start_mon_name = "KITTENPUNCH"  # Starting Pokemon
-        data = POKEMON_DATA[start_mon_name]
-        self.player_pokemon = {
-            "name": start_mon_name,
-            "hp": data["hp"],
-            "max_hp": data["max_hp"],
-            "attack": data["attack"],
-            "defense": data["defense"],
-            "sprite_color": data["sprite_color"]
-        }
+        self.player_pokemon = Pokemon.of_species("KITTENPUNCH")  # Starting Pokemon
 
     def generate_procedural_map(self):
-        """Generates a simple procedural map."""
-        for r in range(MAP_HEIGHT):
-            for c in range(MAP_WIDTH):
-                if r == 0 or c == 0 or r == MAP_HEIGHT - 1 or c == MAP_WIDTH - 1:
-                    self.current_map[r][c] = 2  # Wall
-                else:
-                    rand_val = random.random()
-                    if rand_val < 0.6:
-                        self.current_map[r][c] = 1  # Grass
-                    elif rand_val < 0.8:
-                        self.current_map[r][c] = 0  # Path
-                    elif rand_val < 0.9 and (r > 3 and c > 3 and r < MAP_HEIGHT - 3 and c < MAP_WIDTH - 3):
-                        if self.current_map[r - 1][c] != 2 and self.current_map[r + 1][c] != 2 and self.current_map[r][c - 1] != 2 and self.current_map[r][c + 1] != 2:
-                            self.current_map[r][c] = 3  # Water
-                    else:
-                        self.current_map[r][c] = 2  # Obstacle/Wall
-        self.current_map[self.player_y_tile][self.player_x_tile] = 0
-        self.current_map[self.player_y_tile][self.player_x_tile + 1] = 0
+        """Picks the spawn point, clears it and starts generating the chunks around it."""
+        # Start on the first open stretch of the road along row 0 rather than mid-bridge
+        # or mid-pass; the player, the tile to the right and the NPC spot must all be open.
+        for chunk_x in range(SPAWN_SEARCH_CHUNKS):
+            strip = self.world.region(chunk_x * self.world.chunk_size - 1, -3, self.world.chunk_size + 2, 5)
+            open_column = ((strip != 2) & (strip != 3)).all(axis=0)
+            open_spots = np.flatnonzero(open_column[:-2] & open_column[1:-1] & open_column[2:])
+            if open_spots.size:
+                self.player_x_tile = chunk_x * self.world.chunk_size + int(open_spots[0])
+                break
+        self.world.set_tile(self.player_x_tile, self.player_y_tile, 0)
+        self.world.set_tile(self.player_x_tile + 1, self.player_y_tile, 0)
+        self.world.prefetch_around(self.player_x_tile, self.player_y_tile, CHUNK_PREFETCH_RADIUS)
+
+    def camera_origin(self):
+        """World tile shown in the top-left corner; the view stays centred on the player."""
+        return self.player_x_tile - MAP_WIDTH // 2, self.player_y_tile - MAP_HEIGHT // 2
+
+    def game_time(self):
+        return self.tick_count / TICK_RATE
+
+    def after_ms(self, delay_ms, callback, *args, key=None):
+        """Runs callback after delay_ms of game time."""
+        return self.scheduler.schedule(ticks_for_ms(delay_ms, TICK_RATE), callback, *args, key=key)
+
+    def logical_view(self):
+        camera_x, camera_y = self.camera_origin()
+        return camera_x * TILE_SIZE, camera_y * TILE_SIZE
+
+    def interpolated_view(self, alpha):
+        """World pixel drawn in the top-left corner, alpha of the way into the current tick."""
+        target = self.logical_view()
+        if self.walk_from_view is None or self.tick_count >= self.walk_start_tick + WALK_TICKS:
+            return target
+        progress = (self.tick_count - self.walk_start_tick + alpha) / WALK_TICKS
+        if progress >= 1.0:
+            return target
+        return tuple(round(start + (end - start) * progress) for start, end in zip(self.walk_from_view, target))
 
     def draw_tile(self, surface, tile_type, x_pixel, y_pixel):
         rect = pygame.Rect(x_pixel, y_pixel, TILE_SIZE, TILE_SIZE)
@@ -154,55 +223,91 @@ class RedEmuGame:
             pygame.draw.circle(surface, RED, (x_pixel + TILE_SIZE // 2, y_pixel + TILE_SIZE // 2), TILE_SIZE // 4)
 
     def draw_map(self, surface):
-        for r_idx, row in enumerate(self.current_map):
+        # Mid-scroll the view straddles tiles, so one extra row and column is drawn.
+        # Tiles always go onto the canvas whole and unclipped, so a partly visible
+        # tile looks the same on every frame, whichever frame redraws it.
+        first_x, offset_x = divmod(self.view[0], TILE_SIZE)
+        first_y, offset_y = divmod(self.view[1], TILE_SIZE)
+        visible_tiles = self.world.region(first_x, first_y, MAP_WIDTH + 1, MAP_HEIGHT + 1)
+        canvas = self.map_canvas
+        for r_idx, row in enumerate(visible_tiles.tolist()):
             for c_idx, tile_val in enumerate(row):
-                self.draw_tile(surface, tile_val, c_idx * TILE_SIZE, r_idx * TILE_SIZE)
+                self.draw_tile(canvas, tile_val, c_idx * TILE_SIZE, r_idx * TILE_SIZE)
+        surface.blit(canvas, self.map_rect, pygame.Rect(offset_x, offset_y, self.map_rect.width, self.map_rect.height))
+
+    def player_rect(self):
+        camera_x, camera_y = self.camera_origin()
+        player_pixel_x = (self.player_x_tile - camera_x) * TILE_SIZE + (TILE_SIZE - PLAYER_SIZE) // 2
+        player_pixel_y = (self.player_y_tile - camera_y) * TILE_SIZE + (TILE_SIZE - PLAYER_SIZE) // 2
+        return pygame.Rect(player_pixel_x, player_pixel_y, PLAYER_SIZE, PLAYER_SIZE)
 
     def draw_player(self, surface):
-        player_pixel_x = self.player_x_tile * TILE_SIZE + (TILE_SIZE - PLAYER_SIZE) // 2
-        player_pixel_y = self.player_y_tile * TILE_SIZE + (TILE_SIZE - PLAYER_SIZE) // 2
-        player_rect = pygame.Rect(player_pixel_x, player_pixel_y, PLAYER_SIZE, PLAYER_SIZE)
+        player_rect = self.player_rect()
         pygame.draw.rect(surface, RED, player_rect)
         pygame.draw.rect(surface, BLACK, player_rect, 1)
 
     def draw_textbox(self):
         """Draws the text box at the bottom of the screen."""
-        box_rect = pygame.Rect(0, self.game_screen_height, SCREEN_WIDTH, TEXT_BOX_HEIGHT)
+        box_rect = self.textbox_rect
         pygame.draw.rect(self.screen, LIGHT_YELLOW, box_rect)
         pygame.draw.rect(self.screen, UI_BORDER_COLOR, box_rect, 3)  # Border
 
-        if self.current_textbox_message_lines:
-            for i, line in enumerate(self.current_textbox_message_lines):
-                if i <= self.textbox_line_index:  # Reveal lines one by one
-                    text_surface = self.font.render(line, True, BLACK)
-                    self.screen.blit(text_surface, (15, self.game_screen_height + 15 + (i * (FONT_SIZE + 2))))
-            # Indicator to press action
-            if self.textbox_line_index >= len(self.current_textbox_message_lines) - 1:
-                indicator_text = self.font.render("v (Z)", True, RED)
-                self.screen.blit(indicator_text, (SCREEN_WIDTH - 40, self.actual_screen_height - 25))
+        page = self.current_dialogue_page()
+        if page:
+            revealed = self.dialogue_revealed_chars()
+            self.draw_dialogue_reveal(page, 0, revealed)
+            if revealed == page.char_count:
+                self.draw_textbox_indicator()  # Indicator to press action
+
+    def draw_dialogue_reveal(self, page, start_chars, end_chars):
+        """Blits the parts of a pre-rendered page uncovered between two character counts."""
+        page_x, page_y = 15, self.game_screen_height + 15
+        return [self.screen.blit(page.surface, (page_x + area.x, page_y + area.y), area)
+                for area in page.reveal_rects(start_chars, end_chars)]
+
+    def draw_textbox_indicator(self):
+        indicator_text = self.text_cache.render(self.font, "v (Z)", RED)
+        return self.screen.blit(indicator_text, (SCREEN_WIDTH - 40, self.actual_screen_height - 25))
 
     def show_message(self, message):
-        """Queues a message for the textbox."""
-        self.textbox_message_queue.append(message)
+        """Queues a message for the textbox, wrapped and rendered into pages up front."""
+        self.textbox_message_queue.append(
+            paginate_text(message, self.font, SCREEN_WIDTH - 30, TEXT_BOX_LINES, FONT_SIZE + 2, BLACK, LIGHT_YELLOW))
         if not self.textbox_active:
             self._activate_next_message()
 
     def _activate_next_message(self):
         if self.textbox_message_queue:
-            message = self.textbox_message_queue.pop(0)
-            # Wrap text to fit within the text box
-            self.current_textbox_message_lines = wrap_text(message, self.font, SCREEN_WIDTH - 30)
-            self.textbox_line_index = 0  # Start showing the first line
+            self.dialogue_pages = self.textbox_message_queue.popleft()
+            self.show_dialogue_page(0)
             self.game_state = STATE_TEXTBOX
             self.textbox_active = True
         else:
             self.textbox_active = False
             self.game_state = STATE_OVERWORLD  # Return to overworld
 
+    def show_dialogue_page(self, index):
+        self.dialogue_page_index = index
+        self.dialogue_page_start_tick = self.tick_count  # Start typing it out
+
+    def current_dialogue_page(self):
+        return self.dialogue_pages[self.dialogue_page_index] if self.dialogue_pages else None
+
+    def dialogue_revealed_chars(self):
+        """Characters of the current page typed out so far."""
+        page = self.current_dialogue_page()
+        if page is None:
+            return 0
+        return min(page.char_count, (self.tick_count - self.dialogue_page_start_tick + 1) * TEXT_REVEAL_CHARS_PER_TICK)
+
     def handle_textbox_input(self, event):
         if event.key == pygame.K_z:  # Action button
-            self.textbox_line_index += 1  # Show next line
-            if self.textbox_line_index >= len(self.current_textbox_message_lines):
+            page = self.current_dialogue_page()
+            if page and self.dialogue_revealed_chars() < page.char_count:
+                self.dialogue_page_start_tick = self.tick_count - page.char_count  # Finish typing the page at once
+            elif self.dialogue_page_index + 1 < len(self.dialogue_pages):
+                self.show_dialogue_page(self.dialogue_page_index + 1)  # Next page
+            else:
                 self._activate_next_message()  # Show next message if available
 
     def handle_overworld_input(self, event):
@@ -224,175 +329,397 @@ class RedEmuGame:
             # Check for NPC interaction (basic implementation)
             for dx, dy in [(0, 0), (0, -1), (0, 1), (-1, 0), (1, 0)]:  # Check around player
                 check_x, check_y = self.player_x_tile + dx, self.player_y_tile + dy
-                if 0 <= check_x < MAP_WIDTH and 0 <= check_y < MAP_HEIGHT:
-                    if self.current_map[check_y][check_x] == 4:  # NPC tile
-                        npc_pos = (check_x, check_y)
-                        if npc_pos in self.npc_data:
-                            self.show_message(self.npc_data[npc_pos])
-                            return  # Don't move if interacting
+                if self.world.tile_at(check_x, check_y) == 4:  # NPC tile
+                    npc_pos = (check_x, check_y)
+                    if npc_pos in self.npc_data:
+                        self.show_message(self.npc_data[npc_pos])
+                        return  # Don't move if interacting
 
         if moved:
-            if 0 <= new_x_tile < MAP_WIDTH and 0 <= new_y_tile < MAP_HEIGHT:
-                if self.current_map[new_y_tile][new_x_tile] not in [2, 3]:
-                    self.player_x_tile = new_x_tile
-                    self.player_y_tile = new_y_tile
-                    if self.current_map[self.player_y_tile][self.player_x_tile] == 1:  # Grass tile
-                        if random.random() < 0.15:  # 15% chance for encounter
-                            self.start_battle()
-                elif self.current_map[new_y_tile][new_x_tile] == 3:
-                    self.show_message("That's water! Can't swim yet.")
-
-    def start_battle(self):
-        """Initiates a battle with a wild Pokemon."""
-        if not self.player_pokemon or self.player_pokemon["hp"] <= 0:
+            new_tile = self.world.tile_at(new_x_tile, new_y_tile)
+            if new_tile not in [2, 3]:
+                self.walk_from_view = self.interpolated_view(0.0)  # Scroll on from wherever the view is now
+                self.walk_start_tick = self.tick_count
+                self.player_x_tile = new_x_tile
+                self.player_y_tile = new_y_tile
+                self.world.prefetch_around(new_x_tile, new_y_tile, CHUNK_PREFETCH_RADIUS)
+                encounter_table = self.encounter_tables[new_tile]
+                if encounter_table and self.rng.random() < encounter_table.rate:
+                    self.start_battle(encounter_table)
+            elif new_tile == 3:
+                self.show_message("That's water! Can't swim yet.")
+
+    def start_battle(self, encounter_table):
+        """Initiates a battle with a wild Pokemon drawn from encounter_table."""
+        if not self.player_pokemon or self.player_pokemon.hp <= 0:
             self.show_message("Your Pokemon is too tired to fight!")
             return
 
-        wild_pokemon_name = random.choice(list(POKEMON_DATA.keys()))
-        data = POKEMON_DATA[wild_pokemon_name]
-        self.enemy_pokemon = {
-            "name": wild_pokemon_name,
-            "hp": data["hp"],
-            "max_hp": data["max_hp"],
-            "attack": data["attack"],
-            "defense": data["defense"],
-            "sprite_color": data["sprite_color"]
-        }
+        species_id, level = encounter_table.sample(self.rng)
+        self.enemy_pokemon = Pokemon(species_id)
         self.game_state = STATE_BATTLE
         self.battle_active = True
         self.battle_turn = "player"  # Player starts
-        self.battle_message = f"A wild {self.enemy_pokemon['name']} appeared!"
-        self.last_battle_message_time = time.time()
+        self.battle_message = f"A wild {self.enemy_pokemon.name} (Lv. {level}) appeared!"
+        self.last_battle_message_time = self.game_time()
+
+    def battle_menu_visible(self):
+        """True once the player may pick FIGHT or RUN."""
+        return self.battle_turn == "player" and (self.game_time() - self.last_battle_message_time > 1.0)
 
     def draw_battle_ui(self):
         """Draws the battle interface."""
         self.screen.fill(BLACK)  # Battle background
+        self.draw_battle_enemy_panel()
+        self.draw_battle_player_panel()
+        self.draw_battle_message_box()
 
-        # Enemy Pokemon (top right)
+    def draw_battle_enemy_panel(self):
+        """Enemy Pokemon (top right). Returns the rectangle it covers."""
+        self.screen.fill(BLACK, self.battle_enemy_panel_rect)
         if self.enemy_pokemon:
-            enemy_name_surf = self.large_font.render(self.enemy_pokemon["name"], True, WHITE)
-            enemy_hp_surf = self.font.render(f"HP: {self.enemy_pokemon['hp']}/{self.enemy_pokemon['max_hp']}", True, WHITE)
+            enemy_name_surf = self.text_cache.render(self.large_font, self.enemy_pokemon.name, WHITE)
+            enemy_hp_surf = self.text_cache.render(self.font, f"HP: {self.enemy_pokemon.hp}/{self.enemy_pokemon.max_hp}", WHITE)
             # Placeholder "sprite"
-            pygame.draw.rect(self.screen, self.enemy_pokemon["sprite_color"], (SCREEN_WIDTH - 120, 50, 80, 80))
+            pygame.draw.rect(self.screen, self.enemy_pokemon.sprite_color, (SCREEN_WIDTH - 120, 50, 80, 80))
             pygame.draw.rect(self.screen, WHITE, (SCREEN_WIDTH - 120, 50, 80, 80), 2)  # Border
             self.screen.blit(enemy_name_surf, (SCREEN_WIDTH - 150, 20))
             self.screen.blit(enemy_hp_surf, (SCREEN_WIDTH - 150, 20 + FONT_SIZE + 2))
+        return self.battle_enemy_panel_rect
 
-        # Player Pokemon (bottom left)
+    def draw_battle_player_panel(self):
+        """Player Pokemon (bottom left). Returns the rectangle it covers."""
+        self.screen.fill(BLACK, self.battle_player_panel_rect)
         if self.player_pokemon:
-            player_name_surf = self.large_font.render(self.player_pokemon["name"], True, WHITE)
-            player_hp_surf = self.font.render(f"HP: {self.player_pokemon['hp']}/{self.player_pokemon['max_hp']}", True, WHITE)
+            player_name_surf = self.text_cache.render(self.large_font, self.player_pokemon.name, WHITE)
+            player_hp_surf = self.text_cache.render(self.font, f"HP: {self.player_pokemon.hp}/{self.player_pokemon.max_hp}", WHITE)
             # Placeholder "sprite"
-            pygame.draw.rect(self.screen, self.player_pokemon["sprite_color"], (40, self.actual_screen_height - 200, 80, 80))
+            pygame.draw.rect(self.screen, self.player_pokemon.sprite_color, (40, self.actual_screen_height - 200, 80, 80))
             pygame.draw.rect(self.screen, WHITE, (40, self.actual_screen_height - 200, 80, 80), 2)  # Border
             self.screen.blit(player_name_surf, (30, self.actual_screen_height - 230))
             self.screen.blit(player_hp_surf, (30, self.actual_screen_height - 230 + FONT_SIZE + 2))
+        return self.battle_player_panel_rect
 
-        # Battle Text Box (bottom part of screen)
-        box_rect = pygame.Rect(0, self.game_screen_height, SCREEN_WIDTH, TEXT_BOX_HEIGHT)
+    def draw_battle_message_box(self):
+        """Battle Text Box (bottom part of screen). Returns the rectangle it covers."""
+        box_rect = self.textbox_rect
         pygame.draw.rect(self.screen, LIGHT_YELLOW, box_rect)
         pygame.draw.rect(self.screen, UI_BORDER_COLOR, box_rect, 3)
 
         if self.battle_message:
             lines = wrap_text(self.battle_message, self.font, SCREEN_WIDTH - 30)
             for i, line in enumerate(lines[:2]):  # Max 2 lines
-                text_surface = self.font.render(line, True, BLACK)
+                text_surface = self.text_cache.render(self.font, line, BLACK)
                 self.screen.blit(text_surface, (15, self.game_screen_height + 15 + (i * (FONT_SIZE + 2))))
 
         # Actions (FIGHT or RUN)
-        if self.battle_turn == "player" and (time.time() - self.last_battle_message_time > 1.0):
-            fight_text = self.font.render("1. FIGHT", True, BLACK)
-            run_text = self.font.render("2. RUN", True, BLACK)
+        if self.battle_menu_visible():
+            fight_text = self.text_cache.render(self.font, "1. FIGHT", BLACK)
+            run_text = self.text_cache.render(self.font, "2. RUN", BLACK)
             self.screen.blit(fight_text, (SCREEN_WIDTH // 2 - 50, self.game_screen_height + 20))
             self.screen.blit(run_text, (SCREEN_WIDTH // 2 - 50, self.game_screen_height + 20 + FONT_SIZE + 5))
+        return box_rect
 
     def handle_battle_input(self, event):
-        if self.battle_turn == "player" and (time.time() - self.last_battle_message_time > 1.0):
+        if self.battle_menu_visible():
             if event.key == pygame.K_1:  # FIGHT
                 self.execute_player_attack()
             elif event.key == pygame.K_2:  # RUN
                 self.battle_message = "Got away safely!"
-                self.last_battle_message_time = time.time()
-                pygame.time.set_timer(pygame.USEREVENT + 1, 1500, True)  # End battle after 1.5s
+                self.last_battle_message_time = self.game_time()
+                self.battle_turn = "over"  # No more menu; just wait for the battle to close
+                self.after_ms(1500, self.end_battle, key="battle_end")
 
     def execute_player_attack(self):
         if not self.player_pokemon or not self.enemy_pokemon:
             return
 
         # Simple damage calculation
-        damage = max(1, self.player_pokemon["attack"] - self.enemy_pokemon["defense"] // 2 + random.randint(-2, 2))
-        self.enemy_pokemon["hp"] = max(0, self.enemy_pokemon["hp"] - damage)
-        self.battle_message = f"{self.player_pokemon['name']} attacks! It did {damage} damage!"
-        self.last_battle_message_time = time.time()
-
-        if self.enemy_pokemon["hp"] <= 0:
-            self.battle_message = f"Enemy {self.enemy_pokemon['name']} fainted! You win!"
-            pygame.time.set_timer(pygame.USEREVENT + 1, 2000, True)  # End battle after 2s
+        damage = apply_attack(self.player_pokemon, self.enemy_pokemon, self.rng)
+        self.battle_message = f"{self.player_pokemon.name} attacks! It did {damage} damage!"
+        self.last_battle_message_time = self.game_time()
+
+        if self.enemy_pokemon.hp <= 0:
+            self.battle_message = f"Enemy {self.enemy_pokemon.name} fainted! You win!"
+            self.battle_turn = "over"
+            self.after_ms(2000, self.end_battle, key="battle_end")
         else:
             self.battle_turn = "enemy_pending_message"
-            pygame.time.set_timer(pygame.USEREVENT + 2, 1500, True)  # Enemy attacks after delay
+            self.after_ms(1500, self.take_enemy_turn, key="enemy_turn")  # Enemy attacks after delay
 
     def execute_enemy_attack(self):
         if not self.player_pokemon or not self.enemy_pokemon:
             return
 
-        damage = max(1, self.enemy_pokemon["attack"] - self.player_pokemon["defense"] // 2 + random.randint(-2, 2))
-        self.player_pokemon["hp"] = max(0, self.player_pokemon["hp"] - damage)
-        self.battle_message = f"Wild {self.enemy_pokemon['name']} attacks! It did {damage} damage!"
-        self.last_battle_message_time = time.time()
+        damage = apply_attack(self.enemy_pokemon, self.player_pokemon, self.rng)
+        self.battle_message = f"Wild {self.enemy_pokemon.name} attacks! It did {damage} damage!"
+        self.last_battle_message_time = self.game_time()
 
-        if self.player_pokemon["hp"] <= 0:
-            self.battle_message = f"Your {self.player_pokemon['name']} fainted!"
-            pygame.time.set_timer(pygame.USEREVENT + 1, 2000, True)  # End battle after 2s
+        if self.player_pokemon.hp <= 0:
+            self.battle_message = f"Your {self.player_pokemon.name} fainted!"
+            self.battle_turn = "over"
+            self.after_ms(2000, self.end_battle, key="battle_end")
         else:
             self.battle_turn = "player"
 
+    def take_enemy_turn(self):
+        if self.battle_turn == "enemy_pending_message":
+            self.battle_turn = "enemy"
+            self.execute_enemy_attack()
+
     def end_battle(self):
         self.battle_active = False
         self.enemy_pokemon = None
         self.game_state = STATE_OVERWORLD
         self.battle_message = ""
         # Heal player's Pokemon slightly for testing
-        if self.player_pokemon and self.player_pokemon["hp"] > 0:
-            self.player_pokemon["hp"] = min(self.player_pokemon["max_hp"], self.player_pokemon["hp"] + 5)
+        if self.player_pokemon and self.player_pokemon.hp > 0:
+            self.player_pokemon.hp = min(self.player_pokemon.max_hp, self.player_pokemon.hp + 5)
+
+    def render_frame(self, alpha=0.0):
+        """Redraws the layers whose state changed since the last frame and marks them dirty."""
+        self.view = self.interpolated_view(alpha)
+        if self.game_state == STATE_BATTLE:
+            self.render_battle_frame()
+        else:
+            self.render_overworld_frame()
+
+    def render_overworld_frame(self):
+        last = self.last_frame_keys
+        if last.get("scene") != STATE_OVERWORLD:
+            last.clear()
+            last["scene"] = STATE_OVERWORLD
+            self.screen.fill(BLACK)
+            self.draw_map(self.screen)
+            self.dirty_regions.mark_all()
+
+        view_key = self.view
+        if last.get("view") != view_key:
+            # The view scrolls with every step, so the whole map area changes
+            if "view" in last:
+                self.draw_map(self.screen)
+                self.dirty_regions.mark(self.map_rect)
+            self.draw_player(self.screen)
+            last["view"] = view_key
+
+        page = self.current_dialogue_page()
+        revealed = self.dialogue_revealed_chars()
+        last_page, last_revealed = last.get("textbox", (None, None))
+        if page is not None and page is last_page and revealed > last_revealed:
+            # Still typing the same page: only the new characters need drawing
+            for rect in self.draw_dialogue_reveal(page, last_revealed, revealed):
+                self.dirty_regions.mark(rect)
+            if revealed == page.char_count:
+                self.dirty_regions.mark(self.draw_textbox_indicator())
+        elif "textbox" not in last or (page, revealed) != (last_page, last_revealed):
+            self.draw_textbox()
+            self.dirty_regions.mark(self.textbox_rect)
+        last["textbox"] = (page, revealed)
+
+    def render_battle_frame(self):
+        last = self.last_frame_keys
+        enemy_key = (self.enemy_pokemon.name, self.enemy_pokemon.hp) if self.enemy_pokemon else None
+        player_key = (self.player_pokemon.name, self.player_pokemon.hp) if self.player_pokemon else None
+        box_key = (self.battle_message, self.battle_menu_visible())
+
+        if last.get("scene") != STATE_BATTLE:
+            last.clear()
+            last["scene"] = STATE_BATTLE
+            self.draw_battle_ui()
+            self.dirty_regions.mark_all()
+        else:
+            if last.get("enemy") != enemy_key:
+                self.dirty_regions.mark(self.draw_battle_enemy_panel())
+            if last.get("player") != player_key:
+                self.dirty_regions.mark(self.draw_battle_player_panel())
+            if last.get("box") != box_key:
+                self.dirty_regions.mark(self.draw_battle_message_box())
+        last["enemy"] = enemy_key
+        last["player"] = player_key
+        last["box"] = box_key
+
+    def autosave(self):
+        """Hands what changed since the last save to the save thread; only small copies happen here."""
+        changes = {}
+        if b"WRLD" not in self.saved_state:
+            changes[b"WRLD"] = {None: self.seed}
+            self.saved_state[b"WRLD"] = self.seed
+        player = ("", self.player_x_tile, self.player_y_tile, "DOWN")
+        if self.saved_state.get(b"PLYR") != player:
+            changes[b"PLYR"] = {None: player}
+            self.saved_state[b"PLYR"] = player
+        party = (self.player_pokemon.species_id, self.player_pokemon.hp)
+        if self.saved_state.get(b"PRTY") != party:
+            box = PokemonBox()
+            box.deposit(self.player_pokemon)
+            changes[b"PRTY"] = {None: box}
+            self.saved_state[b"PRTY"] = party
+        chunk_edits = self.world.take_dirty_overrides()  # Only chunks edited since the last save
+        if chunk_edits:
+            changes[b"CHNK"] = chunk_edits
+        self.next_autosave_time = time.perf_counter() + AUTOSAVE_INTERVAL_SECONDS
+        return self.save_writer.save(changes) if changes else None
+
+    def handle_event(self, event):
+        """Dispatches one event; returns False when the game should stop."""
+        if event.type == pygame.QUIT:
+            return False
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_F3:
+                self.toggle_profile_overlay()  # A debug key: never recorded, never game input
+                return True
+            if self.input_recording is not None:
+                self.input_recording.record(self.tick_count, event.key)
+            if self.game_state == STATE_OVERWORLD:
+                self.handle_overworld_input(event)
+            elif self.game_state == STATE_TEXTBOX:
+                self.handle_textbox_input(event)
+            elif self.game_state == STATE_BATTLE:
+                self.handle_battle_input(event)
+        return True
+
+    def toggle_profile_overlay(self):
+        """Shows or hides the frame profile in the top-left corner."""
+        if self.profile_overlay_deadline is None:
+            if self.profile_overlay_font is None:
+                self.profile_overlay_font = pygame.font.SysFont("monospace", OVERLAY_FONT_SIZE)
+            self.profile_overlay_deadline = time.perf_counter()
+        else:
+            self.profile_overlay_deadline = None
+            self.profile_overlay = None
+            self.last_frame_keys.clear()  # Redraw what the overlay covered
+
+    def draw_profile_overlay(self):
+        """Blits the overlay over the frame, re-rendering it every OVERLAY_REFRESH_SECONDS."""
+        if self.profile_overlay_deadline is None:
+            return
+        now = time.perf_counter()
+        if now >= self.profile_overlay_deadline:
+            overlay = render_overlay(self.profiler, self.profile_overlay_font)
+            if self.profile_overlay is not None and overlay.get_size() != self.profile_overlay.get_size():
+                self.last_frame_keys.clear()  # Size changed: repaint the frame under the new overlay
+                self.render_frame(self.frame_clock.alpha)
+            self.profile_overlay = overlay
+            self.profile_overlay_deadline = now + OVERLAY_REFRESH_SECONDS
+            self.dirty_regions.mark(self.screen.blit(overlay, (4, 4)))
+        else:
+            self.screen.blit(self.profile_overlay, (4, 4))  # Opaque, so re-blitting over redrawn parts is safe
 
     def run(self):
         """Main game loop."""
         running = True
+        profiler = self.profiler
+        profiler.instrument(self, {
+            "handle_overworld_input": "input", "handle_textbox_input": "input", "handle_battle_input": "input",
+            "draw_map": "draw_map", "draw_player": "draw_player", "draw_textbox": "draw_textbox",
+            "draw_dialogue_reveal": "draw_textbox",
+            "draw_battle_ui": "draw_battle", "draw_battle_enemy_panel": "draw_battle",
+            "draw_battle_player_panel": "draw_battle", "draw_battle_message_box": "draw_battle",
+        })
         while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                if event.type == pygame.KEYDOWN:
-                    if self.game_state == STATE_OVERWORLD:
-                        self.handle_overworld_input(event)
-                    elif self.game_state == STATE_TEXTBOX:
-                        self.handle_textbox_input(event)
-                    elif self.game_state == STATE_BATTLE:
-                        self.handle_battle_input(event)
-                if event.type == pygame.USEREVENT + 1:  # End battle timer
-                    self.end_battle()
-                    pygame.time.set_timer(pygame.USEREVENT + 1, 0)
-                if event.type == pygame.USEREVENT + 2:  # Enemy attack timer
-                    if self.battle_turn == "enemy_pending_message":
-                        self.battle_turn = "enemy"
-                        self.execute_enemy_attack()
-                    pygame.time.set_timer(pygame.USEREVENT + 2, 0)
+            profiler.begin_frame()
+            if self.save_writer and time.perf_counter() >= self.next_autosave_time:
+                self.autosave()
+            with profiler.phase("events"):
+                events = pygame.event.get()
+            with profiler.phase("logic"):
+                for _ in range(self.frame_clock.advance()):
+                    self.tick_count += 1
+                    self.scheduler.run_until(self.tick_count)
+                for event in events:
+                    running = self.handle_event(event) and running
 
             # --- Drawing ---
-            if self.game_state == STATE_OVERWORLD or self.game_state == STATE_TEXTBOX:
-                self.screen.fill(BLACK)
-                self.draw_map(self.screen)
-                self.draw_player(self.screen)
-                self.draw_textbox()
-            elif self.game_state == STATE_BATTLE:
-                self.draw_battle_ui()
-
-            pygame.display.flip()
-            self.clock.tick(30)  # Cap FPS to 30
-
+            with profiler.phase("render"):
+                self.render_frame(self.frame_clock.alpha)
+                self.draw_profile_overlay()
+            with profiler.phase("present"):
+                self.dirty_regions.present()  # Only changed rectangles reach the display
+            with profiler.phase("sleep"):
+                self.frame_clock.end_frame()
+
+        if self.profile_dump_path:
+            profiler.dump(self.profile_dump_path)
+            print(f"CATSDK: Wrote frame profile ({profiler.frame_count} frames) to {self.profile_dump_path}")
+        if self.input_recording is not None:
+            self.input_recording.finish(self.tick_count, self.state_digest())
+        if self.save_writer:
+            self.autosave()
+            self.save_writer.close()
+        self.world.shutdown()
         pygame.quit()
 
+    def state_digest(self):
+        """SHA-1 over the game state a replay must reproduce (wall-clock fields excluded)."""
+        state = (
+            self.player_x_tile, self.player_y_tile, self.game_state, self.textbox_active,
+            list(self.textbox_message_queue), self.dialogue_pages, self.dialogue_page_index,
+            self.dialogue_page_start_tick,
+            self.battle_active, self.battle_turn, self.battle_message, self.last_battle_message_time,
+            self.player_pokemon, self.enemy_pokemon, self.scheduler.snapshot(),
+            self.rng.getstate(),
+        )
+        digest = hashlib.sha1(repr(state).encode())
+        # Generated chunks follow from the seed; only the edits on top of them are state.
+        for key in sorted(self.world.overrides):
+            digest.update(repr((key, sorted(self.world.overrides[key].items()))).encode())
+        return digest.digest()
+
+    def run_headless(self, input_script, max_ticks=None, render=True):
+        """Runs the game flat out from a scripted input stream and returns ticks per second.
+
+        input_script yields, for every tick, a (possibly empty) sequence of keys
+        pressed on that tick, as InputRecording.input_script() does.
+        """
+        start = time.perf_counter()
+        ticks_run = 0
+        for keys in input_script:
+            if max_ticks is not None and ticks_run >= max_ticks:
+                break
+            self.scheduler.run_until(self.tick_count)
+            events = [pygame.event.Event(pygame.KEYDOWN, key=key) for key in keys]
+            if not all([self.handle_event(event) for event in events]):
+                break
+            if render:
+                self.render_frame()
+                self.dirty_regions.discard()
+            self.tick_count += 1
+            ticks_run += 1
+        elapsed = time.perf_counter() - start
+        return ticks_run / elapsed if elapsed > 0 else float("inf")
+
 if __name__ == '__main__':
-    game = RedEmuGame()
-    game.run()
+    parser = argparse.ArgumentParser(description="RedEMU procedural test world")
+    parser.add_argument("--seed", type=int, default=None, help="world seed")
+    parser.add_argument("--fps", type=int, choices=RENDER_RATES, default=DEFAULT_RENDER_FPS,
+                        help="frame rate cap (0 = uncapped); logic always runs at TICK_RATE")
+    parser.add_argument("--speed", type=float, default=1.0, help="game speed relative to real time")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write frame-phase timings to PATH on exit (CSV if it ends in .csv, JSON otherwise)")
+    parser.add_argument("--save", metavar="PATH",
+                        help="load this save file if it exists (its world seed wins over --seed), autosave to it while playing")
+    parser.add_argument("--record", metavar="PATH", help="record this session's inputs for replay")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recorded session headless at full speed")
+    parser.add_argument("--no-render", action="store_true", help="skip frame composition when replaying")
+    args = parser.parse_args()
+    if args.record and args.save:
+        # A recording holds only the seed and the keys, so state loaded from a save could not be replayed.
+        parser.error("--record can't be combined with --save")
+
+    if args.replay:
+        recording = InputRecording.load(args.replay)
+        game = RedEmuGame(seed=recording.seed, headless=True)
+        ticks_per_second = game.run_headless(recording.input_script(), render=not args.no_render)
+        matched = game.state_digest() == recording.final_digest
+        print(f"CATSDK: Replayed {recording.end_tick + 1} ticks at {ticks_per_second:.0f} ticks/s, "
+              f"final state {'matches' if matched else 'DIVERGED from'} the recording")
+        game.world.shutdown()
+        pygame.quit()
+    else:
+        game = RedEmuGame(seed=args.seed, render_fps=args.fps, time_scale=args.speed, save_path=args.save)
+        game.profile_dump_path = args.profile
+        if args.record:
+            game.input_recording = InputRecording(game.seed)
+        game.run()
+        if args.record:
+            game.input_recording.save(args.record)
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import tempfile
+
+import pygame
+
+ASSET_CACHE_VERSION = 1
+ASSET_PIXEL_FORMAT = "RGB"  # Tiles and map backgrounds are fully opaque
+
+
+def default_cache_dir():
+    return os.environ.get("REDEMU_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "redemu")
+
+
+def content_key(*parts):
+    """SHA-1 hex digest over the given parts (bytes are hashed as-is, anything else by repr)."""
+    digest = hashlib.sha1(repr((ASSET_CACHE_VERSION, pygame.version.ver)).encode())
+    for part in parts:
+        digest.update(part if isinstance(part, (bytes, bytearray, memoryview)) else repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SurfaceCache:
+    """Baked surfaces on disk, one raw pixel file per content key.
+
+    A key changes whenever anything that went into the bake changes, so stale
+    entries are simply never asked for again. Writes go through a temporary
+    file and os.replace, so a crash mid-write never leaves a torn entry. If
+    the directory is not writable the cache quietly does nothing.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key, size):
+        return os.path.join(self.cache_dir, f"{key}-{size[0]}x{size[1]}.{ASSET_PIXEL_FORMAT.lower()}")
+
+    def load(self, key, size):
+        try:
+            with open(self.path_for(key, size), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) != size[0] * size[1] * len(ASSET_PIXEL_FORMAT):
+            return None
+        return pygame.image.frombytes(data, size, ASSET_PIXEL_FORMAT)
+
+    def store(self, key, surface):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(pygame.image.tobytes(surface, ASSET_PIXEL_FORMAT))
+                os.replace(temp_path, self.path_for(key, surface.get_size()))
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError:
+            pass
+
+    def get_or_bake(self, key, size, bake, like=None):
+        """Returns the cached surface for key, or calls bake() and caches what it returns.
+
+        With like, a surface loaded from disk is copied into that surface's
+        pixel format so it blits as fast as a freshly baked one.
+        """
+        surface = self.load(key, size)
+        if surface is not None:
+            self.hits += 1
+            if like is not None:
+                converted = pygame.Surface(size, 0, like)
+                converted.blit(surface, (0, 0))
+                surface = converted
+            return surface
+        self.misses += 1
+        surface = bake()
+        self.store(key, surface)
+        return surface
@@ -0,0 +1,281 @@
+import argparse
+from array import array
+import sys
+import time
+
+import numpy as np
+
+# --- Placeholder Pokemon Data ---
+# Structure: name, hp, attack, defense, "sprite" (color for now)
+POKEMON_DATA = {
+    "KITTENPUNCH": {"hp": 30, "max_hp": 30, "attack": 8, "defense": 5, "sprite_color": (255, 105, 180)},  # Pink
+    "BARKBITE": {"hp": 35, "max_hp": 35, "attack": 7, "defense": 6, "sprite_color": (160, 82, 45)},       # Sienna
+    "PIXELPUP": {"hp": 25, "max_hp": 25, "attack": 9, "defense": 4, "sprite_color": (173, 216, 230)}      # Light Blue
+}
+
+DAMAGE_ROLL_MIN = -2
+DAMAGE_ROLL_MAX = 2
+SIMULATION_BATCH_SIZE = 1_000_000  # Battles resolved per NumPy pass; bounds peak memory
+BOX_RECORD_TYPECODE = "H"  # Stored monsters are a species id and an hp, 2 bytes each
+
+
+# --- Species and Pokemon ---
+def _frozen_column(typecode, values):
+    # A read-only view of a packed array: indexes to plain ints, and NumPy
+    # can wrap it without a copy (np.frombuffer).
+    return memoryview(array(typecode, values)).toreadonly()
+
+
+class SpeciesTable:
+    """Immutable struct-of-arrays species data; everything else refers to species by index."""
+
+    def __init__(self, species_data):
+        self.names = tuple(species_data)
+        self.ids = {name: species_id for species_id, name in enumerate(self.names)}
+        self.max_hp = _frozen_column("H", [data["max_hp"] for data in species_data.values()])
+        self.attack = _frozen_column("H", [data["attack"] for data in species_data.values()])
+        self.defense = _frozen_column("H", [data["defense"] for data in species_data.values()])
+        self.sprite_colors = tuple(tuple(data["sprite_color"]) for data in species_data.values())
+
+    def __len__(self):
+        return len(self.names)
+
+    def stats(self, species_id):
+        """The species as a POKEMON_DATA-style dict (for the simulators)."""
+        return {"hp": self.max_hp[species_id], "max_hp": self.max_hp[species_id], "attack": self.attack[species_id],
+                "defense": self.defense[species_id], "sprite_color": self.sprite_colors[species_id]}
+
+
+SPECIES = SpeciesTable(POKEMON_DATA)
+
+
+class Pokemon:
+    """One monster: a species index and its current hp. Species stats are read from SPECIES."""
+    __slots__ = ("species_id", "hp")
+
+    def __init__(self, species_id, hp=None):
+        self.species_id = species_id
+        self.hp = SPECIES.max_hp[species_id] if hp is None else hp
+
+    @classmethod
+    def of_species(cls, name):
+        return cls(SPECIES.ids[name])
+
+    @property
+    def name(self):
+        return SPECIES.names[self.species_id]
+
+    @property
+    def max_hp(self):
+        return SPECIES.max_hp[self.species_id]
+
+    @property
+    def attack(self):
+        return SPECIES.attack[self.species_id]
+
+    @property
+    def defense(self):
+        return SPECIES.defense[self.species_id]
+
+    @property
+    def sprite_color(self):
+        return SPECIES.sprite_colors[self.species_id]
+
+    def __repr__(self):
+        return f"Pokemon({self.name}, {self.hp}/{self.max_hp})"
+
+
+class PokemonBox:
+    """Compact storage for many monsters (a party or a PC box): two packed columns, 4 bytes a monster.
+
+    Monsters go in and come out as Pokemon instances; only the box keeps
+    the packed form, so thousands of stored monsters cost a few kilobytes.
+    """
+
+    def __init__(self):
+        self.species_ids = array(BOX_RECORD_TYPECODE)
+        self.hp = array(BOX_RECORD_TYPECODE)
+
+    def __len__(self):
+        return len(self.species_ids)
+
+    def deposit(self, pokemon):
+        self.species_ids.append(pokemon.species_id)
+        self.hp.append(pokemon.hp)
+
+    def __getitem__(self, index):
+        return Pokemon(self.species_ids[index], self.hp[index])
+
+    def __iter__(self):
+        return map(Pokemon, self.species_ids, self.hp)
+
+    def withdraw(self, index):
+        pokemon = self[index]
+        del self.species_ids[index]
+        del self.hp[index]
+        return pokemon
+
+    def tobytes(self):
+        """Both columns, little-endian whatever the platform."""
+        columns = [array(BOX_RECORD_TYPECODE, self.species_ids), array(BOX_RECORD_TYPECODE, self.hp)]
+        if sys.byteorder == "big":
+            for column in columns:
+                column.byteswap()
+        return columns[0].tobytes() + columns[1].tobytes()
+
+    @classmethod
+    def frombytes(cls, data):
+        box = cls()
+        half = len(data) // 2
+        box.species_ids.frombytes(data[:half])
+        box.hp.frombytes(data[half:])
+        if sys.byteorder == "big":
+            box.species_ids.byteswap()
+            box.hp.byteswap()
+        return box
+
+
+# --- Battle Resolution ---
+def roll_damage(attack, defense, rng):
+    """Damage for one hit. rng is the game's random.Random."""
+    return max(1, attack - defense // 2 + rng.randint(DAMAGE_ROLL_MIN, DAMAGE_ROLL_MAX))
+
+
+def apply_attack(attacker, defender, rng):
+    """Rolls one hit from attacker on defender (Pokemon), lowers the defender's hp and returns the damage."""
+    damage = roll_damage(attacker.attack, defender.defense, rng)
+    defender.hp = max(0, defender.hp - damage)
+    return damage
+
+
+def resolve_battle(player, enemy, rng):
+    """Plays a whole battle without any UI, player striking first.
+
+    Returns (player_won, turns, hp_left) where turns counts individual attacks
+    and hp_left is the winner's remaining hp. The inputs are not modified.
+    """
+    player_hp, enemy_hp = player["hp"], enemy["hp"]
+    turns = 0
+    while True:
+        enemy_hp = max(0, enemy_hp - roll_damage(player["attack"], enemy["defense"], rng))
+        turns += 1
+        if enemy_hp <= 0:
+            return True, turns, player_hp
+        player_hp = max(0, player_hp - roll_damage(enemy["attack"], player["defense"], rng))
+        turns += 1
+        if player_hp <= 0:
+            return False, turns, enemy_hp
+
+
+# --- Vectorized Monte Carlo ---
+def _simulate_batch(attacker, defender, battles, rng, stats):
+    attacker_hp = np.full(battles, attacker["hp"], dtype=np.int32)
+    defender_hp = np.full(battles, defender["hp"], dtype=np.int32)
+    attacker_base = attacker["attack"] - defender["defense"] // 2
+    defender_base = defender["attack"] - attacker["defense"] // 2
+    live = np.arange(battles)
+    turn = 0
+    while live.size:
+        # Attacker strikes every live battle, then the defender answers in the ones still going.
+        turn += 1
+        rolls = rng.integers(DAMAGE_ROLL_MIN, DAMAGE_ROLL_MAX + 1, size=live.size, dtype=np.int32)
+        hp = defender_hp[live] - np.maximum(1, attacker_base + rolls)
+        defender_hp[live] = hp
+        won = hp <= 0
+        winners = live[won]
+        stats["attacker_wins"] += winners.size
+        stats["turn_counts"][turn] += winners.size
+        stats["attacker_hp_left"] += np.bincount(attacker_hp[winners], minlength=attacker["hp"] + 1)
+        live = live[~won]
+
+        if not live.size:
+            break
+        turn += 1
+        rolls = rng.integers(DAMAGE_ROLL_MIN, DAMAGE_ROLL_MAX + 1, size=live.size, dtype=np.int32)
+        hp = attacker_hp[live] - np.maximum(1, defender_base + rolls)
+        attacker_hp[live] = hp
+        lost = hp <= 0
+        losers = live[lost]
+        stats["turn_counts"][turn] += losers.size
+        stats["defender_hp_left"] += np.bincount(defender_hp[losers], minlength=defender["hp"] + 1)
+        live = live[~lost]
+
+
+def empty_battle_stats(attacker, defender):
+    # Every hit does at least 1 damage, so no battle can outlast both hp pools.
+    max_turns = attacker["hp"] + defender["hp"]
+    return {
+        "battles": 0,
+        "attacker_wins": 0,
+        "turn_counts": np.zeros(max_turns + 1, dtype=np.int64),
+        "attacker_hp_left": np.zeros(attacker["hp"] + 1, dtype=np.int64),
+        "defender_hp_left": np.zeros(defender["hp"] + 1, dtype=np.int64),
+    }
+
+
+def simulate_battles(attacker, defender, battles, seed=None, batch_size=SIMULATION_BATCH_SIZE):
+    """Resolves many attacker-vs-defender battles at once with NumPy.
+
+    attacker and defender are stat dicts (hp, attack, defense) as in
+    POKEMON_DATA; the attacker strikes first, like the player in the game.
+    seed may be an int, a SeedSequence or a numpy Generator. Returns raw
+    counts (see empty_battle_stats) that can be summed across runs and
+    turned into rates with summarize_battle_stats.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    stats = empty_battle_stats(attacker, defender)
+    remaining = battles
+    while remaining > 0:
+        batch = min(batch_size, remaining)
+        _simulate_batch(attacker, defender, batch, rng, stats)
+        remaining -= batch
+    stats["battles"] = battles
+    return stats
+
+
+def summarize_battle_stats(stats):
+    battles = stats["battles"]
+    turn_counts = stats["turn_counts"]
+    turns = np.arange(turn_counts.size)
+    cumulative = np.cumsum(turn_counts)
+
+    def turn_percentile(q):
+        return int(np.searchsorted(cumulative, q * battles)) if battles else 0
+
+    attacker_wins = stats["attacker_wins"]
+    defender_wins = battles - attacker_wins
+    attacker_hp_left = stats["attacker_hp_left"]
+    defender_hp_left = stats["defender_hp_left"]
+    return {
+        "battles": battles,
+        "attacker_win_rate": attacker_wins / battles if battles else 0.0,
+        "mean_turns": float(turns @ turn_counts) / battles if battles else 0.0,
+        "turns_p50": turn_percentile(0.50),
+        "turns_p95": turn_percentile(0.95),
+        "attacker_mean_hp_left": float(np.arange(attacker_hp_left.size) @ attacker_hp_left) / attacker_wins if attacker_wins else 0.0,
+        "defender_mean_hp_left": float(np.arange(defender_hp_left.size) @ defender_hp_left) / defender_wins if defender_wins else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Monte Carlo battle simulator over POKEMON_DATA")
+    parser.add_argument("attacker", nargs="?", help="species that strikes first (default: every pairing)")
+    parser.add_argument("defender", nargs="?")
+    parser.add_argument("-n", "--battles", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.attacker and args.defender:
+        matchups = [(args.attacker, args.defender)]
+    else:
+        matchups = [(a, d) for a in POKEMON_DATA for d in POKEMON_DATA]
+
+    for attacker_name, defender_name in matchups:
+        start = time.perf_counter()
+        stats = simulate_battles(POKEMON_DATA[attacker_name], POKEMON_DATA[defender_name], args.battles, args.seed)
+        elapsed = time.perf_counter() - start
+        summary = summarize_battle_stats(stats)
+        print(f"{attacker_name:>12} vs {defender_name:<12} win {summary['attacker_win_rate']:6.1%}  "
+              f"turns mean {summary['mean_turns']:5.2f} p50 {summary['turns_p50']:>2} p95 {summary['turns_p95']:>2}  "
+              f"hp left {summary['attacker_mean_hp_left']:5.2f}/{summary['defender_mean_hp_left']:5.2f}  "
+              f"({args.battles / elapsed:,.0f} battles/s)")
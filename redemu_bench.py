@@ -0,0 +1,438 @@
+import argparse
+from collections import deque
+import contextlib
+import copy
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Benchmarks never open a real window.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from redemu_battle import SPECIES, Pokemon
+from redemu_encounters import EncounterTable
+from redemu_maps import TRIGGER_NPC, TRIGGER_SIGN, MapPack, Trigger, TriggerGrid, write_map_pack
+from redemu_scheduler import TickScheduler
+from redemu_text import wrap_text
+from redemu_worldgen import ChunkWorld, generate_region
+
+BENCH_FORMAT_VERSION = 2  # 2: game benchmarks restore the game before every call
+BENCH_SEED = 1996
+MAP_SIZES = ((30, 20), (256, 256), (2000, 2000))
+GAME_MAP_SIZE_LIMIT = 256  # Bigger maps would need a multi-gigabyte baked background
+TRIGGER_SPACING = 4  # Dense interaction table: a sign or NPC every 4 tiles each way
+LONG_DIALOGUE_RADIUS = 32  # Triggers this close to the start carry the long dialogue
+DIALOGUE_WORDS = 400
+HEADLESS_FRAME_TICKS = 300
+ENCOUNTER_TABLE_SIZES = (3, 300)  # Species entries per encounter table
+ROUND_SECONDS = 0.1  # Each timed round loops the benchmark for at least this long
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DIALOGUE_VOCABULARY = ("POKEMON", "PROF.", "OAK", "the", "tall", "grass", "is", "where", "wild", "ones", "hide",
+                       "you", "should", "never", "walk", "into", "it", "without", "a", "partner", "of", "your",
+                       "own.", "Take", "this,", "it's", "dangerous", "to", "go", "alone!", "ROUTE", "1", "leads",
+                       "north", "VIRIDIAN", "CITY.")
+
+
+def load_game(name):
+    """Imports one of the numbered game scripts (0.py, 1.py) as a module."""
+    spec = importlib.util.spec_from_file_location(f"redemu_game_{name}", os.path.join(REPO_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def long_dialogue(words=DIALOGUE_WORDS, seed=BENCH_SEED):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(DIALOGUE_VOCABULARY) for _ in range(words))
+
+
+def synthetic_encounter_entries(count, seed=BENCH_SEED):
+    """count (species, weight, min level, max level) entries with uneven weights."""
+    rng = random.Random(seed)
+    entries = []
+    for index in range(count):
+        low = rng.randint(2, 40)
+        entries.append((SPECIES.names[index % len(SPECIES)], rng.randint(1, 1000), low, low + rng.randint(0, 5)))
+    return tuple(entries)
+
+
+def synthetic_map(width, height, trigger_spacing=TRIGGER_SPACING, dialogue=None):
+    """A (map_def, triggers) pair in the KANTO_MAP_DEFS shape.
+
+    Path with diagonal bands of grass, and a sign or NPC every trigger_spacing
+    tiles in both directions. The tiles around the game's start spot (10, 5)
+    are path and free of triggers, so walking and talking there is repeatable.
+    Grass carries the largest benchmarked encounter table.
+    """
+    ys, xs = np.mgrid[0:height, 0:width]
+    tiles = np.where((xs // 8 + ys // 8) % 3 == 2, 1, 0).astype(np.uint8)
+    dialogue = dialogue or long_dialogue()
+    triggers = []
+    for y in range(trigger_spacing - 1, height, trigger_spacing):
+        for x in range(trigger_spacing - 1, width, trigger_spacing):
+            kind = TRIGGER_NPC if (x + y) // trigger_spacing % 2 else TRIGGER_SIGN
+            near_start = max(abs(x - 10), abs(y - 5)) <= LONG_DIALOGUE_RADIUS
+            triggers.append((kind, x, y, dialogue if near_start else f"Tile {x},{y}. Nothing to see here."))
+    encounters = {1: (0.10, synthetic_encounter_entries(max(ENCOUNTER_TABLE_SIZES)))}
+    return {"tiles": tiles, "connections": {}, "encounters": encounters}, triggers
+
+
+def game_restorer(game):
+    """Returns restore(), which puts game back to how it is now.
+
+    Timed calls that play the game restore it first, so every call runs the
+    same code path from the same state however many loops calibration picks.
+    Attributes are put back as they were; containers and Pokemon are copied
+    so play can't change the snapshot, and the RNG state is restored. The
+    scheduler must be empty (true between scenes), and tiles must not be
+    edited during the call.
+    """
+    if len(game.scheduler):
+        raise ValueError("can't snapshot a game with pending timers")
+    attributes = dict(vars(game))
+    rng_state = game.rng.getstate()
+    copied = [name for name, value in attributes.items()
+              if isinstance(value, (list, dict, set, deque, Pokemon))]
+
+    def restore():
+        state = vars(game)
+        state.clear()
+        state.update(attributes)
+        for name in copied:
+            state[name] = copy.copy(attributes[name])
+        game.rng.setstate(rng_state)
+        game.scheduler = TickScheduler(game.tick_count)
+        game.dirty_regions.discard()
+    return restore
+
+
+class BenchContext:
+    """Shared, lazily built fixtures: game modules, scenario map packs and game instances."""
+
+    def __init__(self, scratch_dir):
+        pygame.init()
+        self.scratch_dir = scratch_dir
+        self.modules = {}
+        self.packs = {}
+        self.games = []
+
+    def game_module(self, name):
+        if name not in self.modules:
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.modules[name] = load_game(name)
+        return self.modules[name]
+
+    def scenario_pack(self, width, height):
+        """Path of a map pack holding a synthetic width x height map as the starting map."""
+        if (width, height) not in self.packs:
+            path = os.path.join(self.scratch_dir, f"synthetic-{width}x{height}.rmap")
+            map_def, triggers = synthetic_map(width, height)
+            write_map_pack(path, {"pallet_town": map_def}, {"pallet_town": triggers})
+            self.packs[(width, height)] = path
+        return self.packs[(width, height)]
+
+    def kanto_game(self, width, height):
+        """A headless 0.py game started on the synthetic map (asset cache off, so bakes are timed)."""
+        kanto = self.game_module("0")
+        with contextlib.redirect_stdout(io.StringIO()):
+            game = kanto.RedEmuGame(headless=True, seed=BENCH_SEED, map_pack=self.scenario_pack(width, height),
+                                    asset_cache=False)
+        self.games.append(game)
+        return kanto, game
+
+    def close(self):
+        for game in self.games:
+            if hasattr(game, "map_prefetcher"):
+                game.map_prefetcher.shutdown(wait=True, cancel_futures=True)
+            else:
+                game.world.shutdown()
+        pygame.quit()
+
+
+# --- Benchmarks ---
+# Each setup takes the context and returns the function to time.
+
+def bench_wrap_text(context):
+    kanto = context.game_module("0")
+    font = pygame.font.Font(None, kanto.FONT_SIZE)
+    dialogue = long_dialogue()
+    return lambda: wrap_text(dialogue, font, kanto.SCREEN_WIDTH - 30)
+
+
+def bench_draw_tile(context):
+    kanto, game = context.kanto_game(30, 20)
+    surface = pygame.Surface((kanto.TILE_SIZE * kanto.TILE_TYPE_COUNT, kanto.TILE_SIZE))
+
+    def draw_every_tile():
+        for tile_type in range(kanto.TILE_TYPE_COUNT):
+            game.draw_tile(surface, tile_type, tile_type * kanto.TILE_SIZE, 0)
+    return draw_every_tile
+
+
+def bench_draw_map(context, width, height):
+    _, game = context.kanto_game(width, height)
+    return lambda: game.draw_map(game.map_canvas)
+
+
+def bench_build_map(context, width, height):
+    _, game = context.kanto_game(width, height)
+    return lambda: game.build_kanto_map("pallet_town")
+
+
+def bench_overworld_walk(context, width, height):
+    _, game = context.kanto_game(width, height)
+    event = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RIGHT)
+    restore = game_restorer(game)
+
+    def step_right():
+        restore()
+        game.handle_overworld_input(event)
+    return step_right
+
+
+def bench_overworld_interact(context, width, height):
+    _, game = context.kanto_game(width, height)
+    event = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_z)
+    # Face the trigger at (11, 7), which carries the long dialogue, and press Z.
+    game.player_map_x_tile, game.player_map_y_tile, game.player_facing = 11, 6, "DOWN"
+    restore = game_restorer(game)
+
+    def talk_to_sign():
+        restore()
+        game.handle_overworld_input(event)
+    return talk_to_sign
+
+
+def bench_headless_frames(context, width, height):
+    kanto, game = context.kanto_game(width, height)
+    restore = game_restorer(game)
+
+    def play_ticks():
+        restore()
+        game.run_headless(kanto.random_input_script(BENCH_SEED, HEADLESS_FRAME_TICKS))
+    return play_ticks
+
+
+def bench_map_pack_load(context, width, height):
+    pack = MapPack(context.scenario_pack(width, height))
+    return lambda: pack.load("pallet_town")
+
+
+def bench_trigger_grid(context, width, height):
+    triggers = synthetic_map(width, height)[1]
+    return lambda: TriggerGrid(width, height, (Trigger(*trigger) for trigger in triggers))
+
+
+def bench_generate_region(context, width, height):
+    return lambda: generate_region(BENCH_SEED, 0, 0, width, height)
+
+
+def bench_encounter_sample(context, entries):
+    table = EncounterTable(0.10, synthetic_encounter_entries(entries))
+    rng = random.Random(BENCH_SEED)
+    return lambda: table.sample(rng)
+
+
+def bench_procedural_spawn(context):
+    world_module = context.game_module("1")
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = world_module.RedEmuGame(seed=BENCH_SEED)
+    context.games.append(game)
+
+    def generate_spawn():
+        # Fresh world each time; done once the first frame's tiles are all generated.
+        game.world.shutdown()
+        game.world = ChunkWorld(BENCH_SEED)
+        game.player_x_tile = 0
+        game.generate_procedural_map()
+        camera_x, camera_y = game.camera_origin()
+        game.world.region(camera_x, camera_y, world_module.MAP_WIDTH + 1, world_module.MAP_HEIGHT + 1)
+    return generate_spawn
+
+
+def benchmark_setups():
+    """(name, setup) for every benchmark, in run order; setup(context) returns the function to time."""
+    setups = [
+        ("text.wrap_text[long_dialogue]", bench_wrap_text),
+        ("kanto.draw_tile[all_types]", bench_draw_tile),
+    ]
+    for entries in ENCOUNTER_TABLE_SIZES:
+        setups.append((f"encounters.sample[{entries}]",
+                       lambda context, n=entries: bench_encounter_sample(context, n)))
+    for width, height in MAP_SIZES:
+        size = f"{width}x{height}"
+        if max(width, height) <= GAME_MAP_SIZE_LIMIT:
+            setups += [
+                (f"kanto.draw_map[{size}]", lambda context, w=width, h=height: bench_draw_map(context, w, h)),
+                (f"kanto.build_map[{size}]", lambda context, w=width, h=height: bench_build_map(context, w, h)),
+                (f"kanto.overworld_walk[{size}]",
+                 lambda context, w=width, h=height: bench_overworld_walk(context, w, h)),
+                (f"kanto.overworld_interact[{size}]",
+                 lambda context, w=width, h=height: bench_overworld_interact(context, w, h)),
+                (f"kanto.headless_frames[{size}]",
+                 lambda context, w=width, h=height: bench_headless_frames(context, w, h)),
+            ]
+        setups += [
+            (f"maps.pack_load[{size}]", lambda context, w=width, h=height: bench_map_pack_load(context, w, h)),
+            (f"maps.trigger_grid[{size}]", lambda context, w=width, h=height: bench_trigger_grid(context, w, h)),
+            (f"world.generate_region[{size}]",
+             lambda context, w=width, h=height: bench_generate_region(context, w, h)),
+        ]
+    setups.append(("world.generate_procedural_map[spawn]", bench_procedural_spawn))
+    return setups
+
+
+# --- Timing and comparison ---
+
+def time_function(function, repeat=DEFAULT_REPEAT, round_seconds=ROUND_SECONDS):
+    """Per-call timings in seconds: calls are looped so each of the repeat rounds lasts round_seconds."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= round_seconds:
+            break
+        loops = max(loops * 2, int(loops * round_seconds / max(elapsed, 1e-9)))
+    rounds = [elapsed / loops]  # The calibration round counts as the first
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        rounds.append((time.perf_counter() - start) / loops)
+    return {
+        "median": statistics.median(rounds),
+        "min": min(rounds),
+        "mean": statistics.fmean(rounds),
+        "stdev": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        "loops": loops,
+        "rounds": len(rounds),
+    }
+
+
+def run_benchmarks(name_filters=(), repeat=DEFAULT_REPEAT, on_result=None):
+    """Runs every benchmark whose name contains one of name_filters (all if empty); returns {name: timings}."""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="redemu-bench-", ignore_cleanup_errors=True) as scratch_dir:
+        context = BenchContext(scratch_dir)
+        try:
+            for name, setup in benchmark_setups():
+                if name_filters and not any(part in name for part in name_filters):
+                    continue
+                results[name] = time_function(setup(context), repeat)
+                if on_result:
+                    on_result(name, results[name])
+        finally:
+            context.close()
+    return results
+
+
+def save_results(path, results):
+    with open(path, "w") as f:
+        json.dump({
+            "version": BENCH_FORMAT_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "benchmarks": results,
+        }, f, indent=1)
+
+
+def load_results(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("version") != BENCH_FORMAT_VERSION:
+        raise ValueError(f"{path}: benchmark format version {data.get('version')}, expected {BENCH_FORMAT_VERSION}")
+    return data["benchmarks"]
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Rows of (name, baseline median, current median, ratio, status) by median per-call time.
+
+    status is "regressed" when a benchmark got slower by more than threshold
+    (0.10 = 10%), "improved" when it got faster by the same margin, "new" or
+    "missing" when it is only in one of the runs, and "ok" otherwise.
+    """
+    rows = []
+    for name in list(results) + [name for name in baseline if name not in results]:
+        if name not in baseline:
+            rows.append((name, None, results[name]["median"], None, "new"))
+            continue
+        if name not in results:
+            rows.append((name, baseline[name]["median"], None, None, "missing"))
+            continue
+        before, after = baseline[name]["median"], results[name]["median"]
+        ratio = after / before if before > 0 else float("inf")
+        if ratio > 1 + threshold:
+            status = "regressed"
+        elif ratio < 1 / (1 + threshold):
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, before, after, ratio, status))
+    return rows
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the engine's hot paths and compare against a baseline")
+    parser.add_argument("--filter", action="append", default=[], metavar="TEXT",
+                        help="only run benchmarks whose name contains TEXT (repeatable)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed rounds per benchmark")
+    parser.add_argument("--save", metavar="PATH", help="write the results to PATH as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against results saved earlier with --save")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that counts as a regression (0.10 = 10%%)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, _ in benchmark_setups():
+            print(name)
+        sys.exit(0)
+
+    baseline = load_results(args.baseline) if args.baseline else None
+    results = run_benchmarks(args.filter, max(1, args.repeat), on_result=lambda name, timings: print(
+        f"{name:<44}{format_seconds(timings['median']):>12}  (min {format_seconds(timings['min'])}, "
+        f"{timings['loops']} loops x {timings['rounds']})"))
+    if args.save:
+        save_results(args.save, results)
+        print(f"CATSDK: Saved {len(results)} benchmark results to {args.save}")
+    if baseline is not None:
+        if args.filter:
+            baseline = {name: timings for name, timings in baseline.items() if any(part in name for part in args.filter)}
+        rows = compare_results(results, baseline, args.threshold)
+        print(f"\n{'benchmark':<44}{'baseline':>12}{'current':>12}{'ratio':>8}  status")
+        for name, before, after, ratio, status in rows:
+            ratio_text = "-" if ratio is None else f"{ratio:.2f}x"
+            print(f"{name:<44}{format_seconds(before):>12}{format_seconds(after):>12}{ratio_text:>8}  {status}")
+        regressions = [row for row in rows if row[4] == "regressed"]
+        if regressions:
+            print(f"CATSDK: {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"CATSDK: No regressions beyond {args.threshold:.0%}")
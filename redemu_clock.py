@@ -0,0 +1,57 @@
+import time
+
+import pygame
+
+RENDER_RATES = (30, 60, 144, 0)  # Supported frame caps; 0 renders as fast as possible
+MAX_FRAME_TIME = 0.25  # Longest stretch of real time simulated in one frame
+
+
+class FixedStepClock:
+    """Fixed-timestep accumulator on the monotonic clock.
+
+    Each frame, advance() says how many logic ticks fell due; rendering then
+    uses alpha (0..1, how far real time has got into the next tick) to
+    interpolate. time_scale above 1 runs logic faster than real time. A
+    stall longer than max_frame_time is only simulated up to that limit, so
+    one hitch never turns into a burst of catch-up ticks. Time the loop spent
+    deliberately asleep (reported with add_idle_time) is never cut short.
+    """
+
+    def __init__(self, tick_rate, render_fps=30, time_scale=1.0, max_frame_time=MAX_FRAME_TIME):
+        self.tick_seconds = 1.0 / tick_rate
+        self.render_fps = render_fps
+        self.time_scale = time_scale
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0.0
+        self.idle_time = 0.0
+        self.last_time = time.perf_counter()
+        self.frame_clock = pygame.time.Clock()
+
+    def advance(self):
+        """Banks the real time since the last call and returns the number of whole ticks due."""
+        now = time.perf_counter()
+        busy_time = min(now - self.last_time - self.idle_time, self.max_frame_time)
+        self.accumulator += (max(0.0, busy_time) + self.idle_time) * self.time_scale
+        self.idle_time = 0.0
+        self.last_time = now
+        ticks = int(self.accumulator / self.tick_seconds)
+        self.accumulator -= ticks * self.tick_seconds
+        return ticks
+
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator / self.tick_seconds)
+
+    def add_idle_time(self, seconds):
+        self.idle_time += seconds
+
+    def time_of_tick(self, ticks_ahead):
+        """perf_counter moment by which ticks_ahead more ticks will have fallen due."""
+        return self.last_time + (ticks_ahead * self.tick_seconds - self.accumulator) / self.time_scale
+
+    def end_frame(self):
+        """Waits out the rest of the frame at the render rate (0 means uncapped)."""
+        self.frame_clock.tick(self.render_fps)
+
+    def get_fps(self):
+        return self.frame_clock.get_fps()
@@ -0,0 +1,48 @@
+import pygame
+
+
+class DirtyRegions:
+    """Collects the screen rectangles that changed since the last present."""
+
+    def __init__(self, screen_rect):
+        self.screen_rect = pygame.Rect(screen_rect)
+        self.rects = []
+        self.full_redraw = True
+
+    def __bool__(self):
+        return self.full_redraw or bool(self.rects)
+
+    def mark(self, rect):
+        if self.full_redraw:
+            return
+        rect = self.screen_rect.clip(rect)
+        if rect.width <= 0 or rect.height <= 0:
+            return
+        # Fold overlapping regions together so the same pixels are not pushed twice.
+        hit = rect.collidelist(self.rects)
+        while hit != -1:
+            rect.union_ip(self.rects.pop(hit))
+            hit = rect.collidelist(self.rects)
+        self.rects.append(rect)
+
+    def mark_all(self):
+        self.full_redraw = True
+        self.rects = []
+
+    def discard(self):
+        """Forgets pending regions without touching the display (headless frames)."""
+        self.rects = []
+        self.full_redraw = False
+
+    def present(self):
+        """Pushes the changed regions to the display and returns them."""
+        if self.full_redraw:
+            presented = [self.screen_rect.copy()]
+            pygame.display.update(presented)
+        else:
+            presented = self.rects
+            if presented:
+                pygame.display.update(presented)
+        self.rects = []
+        self.full_redraw = False
+        return presented
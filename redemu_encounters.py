@@ -0,0 +1,98 @@
+from redemu_battle import SPECIES
+
+# --- Encounter Tables ---
+# Declared per map and tile type:
+#   {tile_type: (chance per step, ((species name, weight, min level, max level), ...))}
+# and compiled once, when the map loads, into EncounterTables.
+TILE_TYPE_LIMIT = 256  # Tile values are bytes
+DEFAULT_LEVELS = (2, 5)
+MAX_LEVEL = 255       # Map packs store levels in one byte
+MAX_WEIGHT = 0xFFFF   # and weights in two
+
+
+class AliasSampler:
+    """Draws an index with probability proportional to its weight in O(1) (Vose's alias method).
+
+    Building it is O(n); each draw is one rng.random(), one multiply and two
+    tuple lookups, however many weights there are, and allocates nothing.
+    """
+    __slots__ = ("size", "accept", "alias")
+
+    def __init__(self, weights):
+        weights = [float(weight) for weight in weights]
+        total = sum(weights)
+        if not weights or total <= 0 or min(weights) < 0:
+            raise ValueError(f"alias weights must be non-negative with a positive total: {weights!r}")
+        size = len(weights)
+        scaled = [weight * size / total for weight in weights]
+        accept = [1.0] * size
+        alias = list(range(size))
+        small = [index for index, weight in enumerate(scaled) if weight < 1.0]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            accept[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1.0 up to rounding and keeps accept = 1.0.
+        self.size = size
+        self.accept = tuple(accept)
+        self.alias = tuple(alias)
+
+    def __len__(self):
+        return self.size
+
+    def sample(self, rng):
+        # One uniform draw picks the column (integer part) and the coin (fraction).
+        scaled = rng.random() * self.size
+        column = int(scaled)
+        return column if scaled - column < self.accept[column] else self.alias[column]
+
+
+class EncounterTable:
+    """One tile type's wild encounters on one map, compiled for sampling."""
+    __slots__ = ("rate", "species_ids", "min_levels", "max_levels", "sampler")
+
+    def __init__(self, rate, entries):
+        if not entries:
+            raise ValueError("an encounter table needs at least one species")
+        for entry in entries:
+            _name, weight, low, high = entry
+            if not 1 <= low <= high <= MAX_LEVEL:
+                raise ValueError(f"encounter levels must satisfy 1 <= min <= max <= {MAX_LEVEL}: {entry!r}")
+            if not isinstance(weight, int) or not 0 <= weight <= MAX_WEIGHT:
+                raise ValueError(f"encounter weights must be whole numbers from 0 to {MAX_WEIGHT}: {entry!r}")
+        self.rate = float(rate)
+        try:
+            self.species_ids = tuple(SPECIES.ids[name] for name, _weight, _low, _high in entries)
+        except KeyError as error:
+            raise ValueError(f"unknown species in encounter table: {error.args[0]!r}") from None
+        self.min_levels = tuple(low for _name, _weight, low, _high in entries)
+        self.max_levels = tuple(high for _name, _weight, _low, high in entries)
+        self.sampler = AliasSampler(weight for _name, weight, _low, _high in entries)
+
+    def __len__(self):
+        return len(self.species_ids)
+
+    def sample(self, rng):
+        """(species_id, level) of a wild encounter."""
+        entry = self.sampler.sample(rng)
+        return self.species_ids[entry], rng.randint(self.min_levels[entry], self.max_levels[entry])
+
+
+def compile_encounters(encounters):
+    """Turns a map's declared encounters into a list indexed by tile type (None where nothing lives)."""
+    tables = [None] * TILE_TYPE_LIMIT
+    for tile_type, (rate, entries) in encounters.items():
+        tables[tile_type] = EncounterTable(rate, entries)
+    return tables
+
+
+def uniform_encounters(encounter_tiles, rates_by_tile, levels=DEFAULT_LEVELS):
+    """Declared encounters matching the old behaviour: every species equally likely on each listed tile.
+
+    Used for maps that only say which tiles have encounters (version 1 map packs).
+    """
+    entries = tuple((name, 1, levels[0], levels[1]) for name in SPECIES.names)
+    return {tile_type: (float(rates_by_tile[tile_type]), entries) for tile_type in encounter_tiles}
@@ -0,0 +1,243 @@
+import mmap
+import struct
+
+import numpy as np
+
+# --- Trigger Kinds ---
+TRIGGER_SIGN = 1  # Read with Z
+TRIGGER_DOOR = 2  # Read with Z
+TRIGGER_NPC = 3   # Talk with Z
+TRIGGER_WARP = 4  # Fires when stepped on; moves the player to target
+TRIGGER_STEP = 5  # Fires when stepped on; shows its message
+INTERACT_TRIGGERS = (TRIGGER_SIGN, TRIGGER_DOOR, TRIGGER_NPC)
+STEP_TRIGGERS = (TRIGGER_WARP, TRIGGER_STEP)
+
+DIRECTION_DELTAS = {
+    'LEFT': (-1, 0),
+    'RIGHT': (1, 0),
+    'UP': (0, -1),
+    'DOWN': (0, 1),
+}
+
+
+class Trigger:
+    __slots__ = ("kind", "x", "y", "message", "target")
+
+    def __init__(self, kind, x, y, message="", target=None):
+        self.kind = kind
+        self.x = x
+        self.y = y
+        self.message = message
+        self.target = target  # (map_id, x, y) for warps
+
+    def __repr__(self):
+        return f"Trigger({self.kind}, {self.x}, {self.y}, {self.message!r}, {self.target!r})"
+
+
+class TriggerGrid:
+    """Dense per-map index of triggers, built once when the map loads.
+
+    Every cell holds the index of its trigger (or -1), so lookups cost the
+    same whether a map has five triggers or five thousand.
+    """
+
+    def __init__(self, width, height, triggers=()):
+        self.width = width
+        self.height = height
+        self.index = np.full((height, width), -1, dtype=np.int32)
+        self.triggers = []
+        for trigger in triggers:
+            self.add(trigger)
+
+    def __len__(self):
+        return len(self.triggers)
+
+    def add(self, trigger):
+        if not (0 <= trigger.x < self.width and 0 <= trigger.y < self.height):
+            raise ValueError(f"trigger outside the {self.width}x{self.height} map: {trigger!r}")
+        existing = self.index[trigger.y, trigger.x]
+        if existing >= 0:
+            self.triggers[existing] = trigger
+        else:
+            self.index[trigger.y, trigger.x] = len(self.triggers)
+            self.triggers.append(trigger)
+
+    def at(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            trigger_index = self.index[y, x]
+            if trigger_index >= 0:
+                return self.triggers[trigger_index]
+        return None
+
+    def facing(self, x, y, direction):
+        dx, dy = DIRECTION_DELTAS[direction]
+        return self.at(x + dx, y + dy)
+
+
+# --- Binary Map Pack ---
+# File:   header | map records... | directory
+# Header: magic, version, map count, directory offset
+# Directory entry: name, record offset, record length
+# Record: MAP_RECORD_HEADER | tile layers (width*height bytes each, row-major)
+#         | connections | encounter tables | triggers
+# Encounter table: ENCOUNTER_TABLE_RECORD, then per species ENCOUNTER_ENTRY_RECORD + species name.
+# Version 1 records hold a bare list of encounter tile bytes in place of the tables.
+MAP_PACK_MAGIC = b"RMAP"
+MAP_PACK_VERSION = 2
+MAP_PACK_READABLE_VERSIONS = (1, 2)
+MAP_PACK_HEADER = struct.Struct("<4sHHI")
+MAP_DIRECTORY_ENTRY = struct.Struct("<II")
+MAP_RECORD_HEADER = struct.Struct("<HHBBBI")  # width, height, layers, connections, encounter tables, triggers
+CONNECTION_RECORD = struct.Struct("<BHH")     # edge, x, y (target map name follows)
+TRIGGER_RECORD = struct.Struct("<BHHH")       # kind, x, y, message length
+TRIGGER_TARGET_RECORD = struct.Struct("<HH")  # x, y (after the target map name)
+ENCOUNTER_TABLE_RECORD = struct.Struct("<BfH")  # tile type, chance per step, species entries
+ENCOUNTER_ENTRY_RECORD = struct.Struct("<HBB")  # weight, min level, max level (species name follows)
+EDGE_NAMES = ("NORTH_EDGE", "SOUTH_EDGE", "WEST_EDGE", "EAST_EDGE")
+
+
+def _pack_name(name):
+    encoded = name.encode()
+    return struct.pack("<B", len(encoded)) + encoded
+
+
+def _unpack_name(data, pos):
+    length = data[pos]
+    return bytes(data[pos + 1:pos + 1 + length]).decode(), pos + 1 + length
+
+
+def encode_map_record(tiles, connections, encounters, triggers):
+    """Serializes one map definition (the KANTO_MAP_DEFS shape plus its trigger tuples)."""
+    layer = np.ascontiguousarray(tiles, dtype=np.uint8)
+    height, width = layer.shape
+    out = bytearray(MAP_RECORD_HEADER.pack(width, height, 1, len(connections), len(encounters), len(triggers)))
+    out += layer.tobytes()
+    for edge, (target_map, x, y) in connections.items():
+        out += CONNECTION_RECORD.pack(EDGE_NAMES.index(edge), x, y) + _pack_name(target_map)
+    for tile_type, (rate, entries) in encounters.items():
+        out += ENCOUNTER_TABLE_RECORD.pack(tile_type, rate, len(entries))
+        for species, weight, min_level, max_level in entries:
+            out += ENCOUNTER_ENTRY_RECORD.pack(weight, min_level, max_level) + _pack_name(species)
+    for kind, x, y, message, *target in triggers:
+        encoded_message = message.encode()
+        out += TRIGGER_RECORD.pack(kind, x, y, len(encoded_message)) + encoded_message
+        if target and target[0]:
+            target_map, target_x, target_y = target[0]
+            out += b"\1" + _pack_name(target_map) + TRIGGER_TARGET_RECORD.pack(target_x, target_y)
+        else:
+            out += b"\0"
+    return bytes(out)
+
+
+def write_map_pack(path, map_defs, triggers_by_map):
+    """Converts literal map definitions into a binary map pack at path."""
+    records = []
+    directory = bytearray()
+    offset = MAP_PACK_HEADER.size
+    for map_id, map_def in map_defs.items():
+        record = encode_map_record(map_def["tiles"], map_def["connections"], map_def["encounters"],
+                                   triggers_by_map.get(map_id, ()))
+        records.append(record)
+        directory += _pack_name(map_id) + MAP_DIRECTORY_ENTRY.pack(offset, len(record))
+        offset += len(record)
+    with open(path, "wb") as f:
+        f.write(MAP_PACK_HEADER.pack(MAP_PACK_MAGIC, MAP_PACK_VERSION, len(records), offset))
+        for record in records:
+            f.write(record)
+        f.write(directory)
+
+
+class MapPack:
+    """Memory-mapped map pack. Opening reads only the directory; each map's
+    pages are touched the first time that map is loaded.
+
+    The mapping is copy-on-write, so tile arrays handed out by load() can be
+    edited in place without ever writing back to the file. Keep the pack open
+    for as long as those arrays are in use.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, map_count, directory_offset = MAP_PACK_HEADER.unpack_from(self.data)
+        if magic != MAP_PACK_MAGIC or version not in MAP_PACK_READABLE_VERSIONS:
+            raise ValueError(f"{path} is not a RedEMU map pack (or an unsupported version)")
+        self.version = version
+        self.directory = {}
+        pos = directory_offset
+        for _ in range(map_count):
+            map_id, pos = _unpack_name(self.data, pos)
+            self.directory[map_id] = MAP_DIRECTORY_ENTRY.unpack_from(self.data, pos)
+            pos += MAP_DIRECTORY_ENTRY.size
+
+    def __contains__(self, map_id):
+        return map_id in self.directory
+
+    def map_ids(self):
+        return list(self.directory)
+
+    def load(self, map_id):
+        """Returns the map in KANTO_MAP_DEFS shape, plus its trigger tuples under "triggers".
+
+        Version 1 packs carry no encounter tables; their maps come back with
+        "encounter_tiles" (the tile types that had encounters) instead of "encounters".
+        """
+        offset, _length = self.directory[map_id]
+        data = self.data
+        width, height, layer_count, connection_count, encounter_count, trigger_count = \
+            MAP_RECORD_HEADER.unpack_from(data, offset)
+        pos = offset + MAP_RECORD_HEADER.size
+        layers = []
+        for _ in range(layer_count):
+            layers.append(np.frombuffer(data, dtype=np.uint8, count=width * height, offset=pos).reshape(height, width))
+            pos += width * height
+        connections = {}
+        for _ in range(connection_count):
+            edge, x, y = CONNECTION_RECORD.unpack_from(data, pos)
+            target_map, pos = _unpack_name(data, pos + CONNECTION_RECORD.size)
+            connections[EDGE_NAMES[edge]] = (target_map, x, y)
+        encounters = {}
+        if self.version == 1:
+            encounter_tiles = list(data[pos:pos + encounter_count])
+            pos += encounter_count
+        else:
+            for _ in range(encounter_count):
+                tile_type, rate, entry_count = ENCOUNTER_TABLE_RECORD.unpack_from(data, pos)
+                pos += ENCOUNTER_TABLE_RECORD.size
+                entries = []
+                for _ in range(entry_count):
+                    weight, min_level, max_level = ENCOUNTER_ENTRY_RECORD.unpack_from(data, pos)
+                    species, pos = _unpack_name(data, pos + ENCOUNTER_ENTRY_RECORD.size)
+                    entries.append((species, weight, min_level, max_level))
+                encounters[tile_type] = (rate, tuple(entries))
+        triggers = []
+        for _ in range(trigger_count):
+            kind, x, y, message_length = TRIGGER_RECORD.unpack_from(data, pos)
+            pos += TRIGGER_RECORD.size
+            message = bytes(data[pos:pos + message_length]).decode()
+            pos += message_length
+            has_target = data[pos]
+            pos += 1
+            if has_target:
+                target_map, pos = _unpack_name(data, pos)
+                target_x, target_y = TRIGGER_TARGET_RECORD.unpack_from(data, pos)
+                pos += TRIGGER_TARGET_RECORD.size
+                triggers.append((kind, x, y, message, (target_map, target_x, target_y)))
+            else:
+                triggers.append((kind, x, y, message))
+        map_def = {
+            "tiles": layers[0],
+            "layers": layers,
+            "connections": connections,
+            "triggers": triggers,
+        }
+        if self.version == 1:
+            map_def["encounter_tiles"] = encounter_tiles
+        else:
+            map_def["encounters"] = encounters
+        return map_def
+
+    def close(self):
+        self.data.close()
+        self.file.close()
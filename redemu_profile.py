@@ -0,0 +1,142 @@
+import csv
+from collections import deque
+import functools
+import json
+import time
+
+import numpy as np
+import pygame
+
+PROFILE_WINDOW = 600  # Frames the rolling figures cover
+OVERLAY_REFRESH_SECONDS = 0.5
+PERCENTILES = (50, 95, 99)
+OVERLAY_FONT_SIZE = 13
+
+
+class _Phase:
+    __slots__ = ("profiler", "name")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.start(self.name)
+
+    def __exit__(self, *exc_info):
+        self.profiler.stop()
+
+
+class FrameProfiler:
+    """Times the phases of each frame and keeps the last `window` frames.
+
+    Phases nest: a phase's figure is its own time with any phases opened
+    inside it taken out, so the phases of a frame add up to the frame. The
+    same phase may run several times in a frame; its times are summed.
+    Figures are in milliseconds.
+    """
+
+    def __init__(self, window=PROFILE_WINDOW):
+        self.frames = deque(maxlen=window)
+        self.phase_names = []
+        self.current = {}
+        self.stack = []  # [name, start, time spent in nested phases]
+        self.frame_start = None
+        self.frame_count = 0
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.current["frame"] = (now - self.frame_start) * 1000.0
+            self.frames.append(self.current)
+            self.frame_count += 1
+        self.current = {}
+        self.frame_start = now
+
+    def start(self, name):
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def stop(self):
+        name, start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self._record(name, elapsed - nested)
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def add(self, name, seconds):
+        """Records time measured elsewhere (e.g. an idle wait) against a phase.
+
+        Inside an open phase the time counts as nested in it, like a phase
+        opened there, so it is not counted twice.
+        """
+        self._record(name, seconds)
+        if self.stack:
+            self.stack[-1][2] += seconds
+
+    def _record(self, name, seconds):
+        if name not in self.current:
+            self.current[name] = 0.0
+            if name not in self.phase_names:
+                self.phase_names.append(name)
+        self.current[name] += seconds * 1000.0
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def instrument(self, obj, phases):
+        """Wraps obj's methods so each call is timed; phases maps method name to phase name."""
+        for method_name, phase_name in phases.items():
+            method = getattr(obj, method_name)
+
+            @functools.wraps(method)
+            def timed(*args, _method=method, _phase=phase_name, **kwargs):
+                self.start(_phase)
+                try:
+                    return _method(*args, **kwargs)
+                finally:
+                    self.stop()
+            setattr(obj, method_name, timed)
+
+    def summary(self):
+        """{phase: {p50, p95, p99, mean, max, frames}} over the frames in which the phase ran."""
+        result = {}
+        for name in ["frame"] + self.phase_names:
+            samples = np.array([frame[name] for frame in self.frames if name in frame])
+            if not samples.size:
+                continue
+            p50, p95, p99 = np.percentile(samples, PERCENTILES)
+            result[name] = {"p50": float(p50), "p95": float(p95), "p99": float(p99),
+                            "mean": float(samples.mean()), "max": float(samples.max()), "frames": int(samples.size)}
+        return result
+
+    def overlay_lines(self):
+        lines = [f"{'phase':<13}{'p50':>7}{'p95':>7}{'p99':>7}  ms"]
+        for name, figures in self.summary().items():
+            lines.append(f"{name:<13}{figures['p50']:>7.2f}{figures['p95']:>7.2f}{figures['p99']:>7.2f}")
+        return lines
+
+    def dump(self, path):
+        """Writes the summary and every frame in the window; CSV if path ends in .csv, JSON otherwise."""
+        columns = ["frame"] + self.phase_names
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for frame in self.frames:
+                    writer.writerow([f"{frame.get(name, 0.0):.4f}" for name in columns])
+        else:
+            with open(path, "w") as f:
+                json.dump({"frames_seen": self.frame_count, "window": len(self.frames), "summary": self.summary(),
+                           "frames": [{name: round(frame.get(name, 0.0), 4) for name in columns} for frame in self.frames]},
+                          f, indent=1)
+
+
+def render_overlay(profiler, font, color=(255, 255, 255), background=(0, 0, 0)):
+    """The overlay as an opaque surface, so it can be blitted again over itself."""
+    lines = profiler.overlay_lines()
+    line_height = font.get_linesize()
+    surface = pygame.Surface((max(font.size(line)[0] for line in lines) + 8, line_height * len(lines) + 8))
+    surface.fill(background)
+    for index, line in enumerate(lines):
+        surface.blit(font.render(line, True, color, background), (4, 4 + index * line_height))
+    return surface
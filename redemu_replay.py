@@ -0,0 +1,93 @@
+import struct
+
+REPLAY_MAGIC = b"RRPL"
+REPLAY_VERSION = 1
+# magic, version, game seed, last tick of the session, sha1 state digest, event count
+REPLAY_HEADER = struct.Struct("<4sBqI20sI")
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class InputRecording:
+    """Per-tick key presses of one session, plus what is needed to replay it.
+
+    Events are stored as (tick, key) pairs in the order they were handled.
+    On disk the ticks are delta-encoded and everything is varint-packed, so
+    an hour of play is a few kilobytes.
+    """
+
+    def __init__(self, seed, events=None, end_tick=0, final_digest=b""):
+        self.seed = seed
+        self.events = events if events is not None else []
+        self.end_tick = end_tick
+        self.final_digest = final_digest
+
+    def record(self, tick, key):
+        self.events.append((tick, key))
+
+    def finish(self, end_tick, final_digest):
+        self.end_tick = end_tick
+        self.final_digest = final_digest
+
+    def input_script(self):
+        """Yields the keys pressed on each tick from 0 through end_tick."""
+        events = self.events
+        index = 0
+        for tick in range(self.end_tick + 1):
+            keys = []
+            while index < len(events) and events[index][0] == tick:
+                keys.append(events[index][1])
+                index += 1
+            yield keys
+
+    def to_bytes(self):
+        body = bytearray()
+        last_tick = 0
+        for tick, key in self.events:
+            _write_varint(body, tick - last_tick)
+            _write_varint(body, key)
+            last_tick = tick
+        header = REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.end_tick,
+                                    self.final_digest.ljust(20, b"\0"), len(self.events))
+        return header + bytes(body)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, end_tick, digest, count = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("not a RedEMU replay (or an unsupported version)")
+        events = []
+        pos = REPLAY_HEADER.size
+        tick = 0
+        for _ in range(count):
+            delta, pos = _read_varint(data, pos)
+            key, pos = _read_varint(data, pos)
+            tick += delta
+            events.append((tick, key))
+        return cls(seed, events, end_tick, digest)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
@@ -0,0 +1,216 @@
+import os
+import stat
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import zlib
+
+from redemu_battle import PokemonBox
+
+SAVE_MAGIC = b"RSAV"
+SAVE_VERSION = 1
+SAVE_HEADER = struct.Struct("<4sHH")  # magic, version, section count
+SECTION_HEADER = struct.Struct("<4sII")  # tag, payload length, CRC-32 of the payload
+RECORD_LENGTH = struct.Struct("<I")
+PLAYER_RECORD = struct.Struct("<iiB")  # x, y, facing; followed by the map id
+WORLD_RECORD = struct.Struct("<q")  # world seed (--seed may be negative)
+TILE_EDIT = struct.Struct("<HHB")  # x, y, tile
+CHUNK_KEY = struct.Struct("<ii")
+FACINGS = ("UP", "DOWN", "LEFT", "RIGHT")
+
+# Read once at import: os.umask can only be read by setting it, which races with other threads.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path):
+    """The mode a rewrite of path should have: the existing file's, else what open() would give a new file."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def write_atomic(path, data):
+    """Replaces path with data so that a crash leaves either the old file or the new one, never a mix."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".save-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # mkstemp makes the file 0600, and os.replace would keep that.
+            os.chmod(temp_path, _file_mode(path))
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def encode_save(sections):
+    """Serializes {tag: [record bytes, ...]}; each section is a length-prefixed record list with a checksum."""
+    out = bytearray(SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, len(sections)))
+    for tag, records in sections.items():
+        payload = b"".join(RECORD_LENGTH.pack(len(record)) + record for record in records)
+        out += SECTION_HEADER.pack(tag, len(payload), zlib.crc32(payload)) + payload
+    return bytes(out)
+
+
+def decode_save(data):
+    """Parses a save file's bytes back into {tag: [record bytes, ...]}."""
+    if len(data) < SAVE_HEADER.size:
+        raise ValueError("not a RedEMU save (file too short)")
+    magic, version, section_count = SAVE_HEADER.unpack_from(data)
+    if magic != SAVE_MAGIC or version != SAVE_VERSION:
+        raise ValueError("not a RedEMU save (or an unsupported version)")
+    sections = {}
+    pos = SAVE_HEADER.size
+    for _ in range(section_count):
+        tag, length, checksum = SECTION_HEADER.unpack_from(data, pos)
+        pos += SECTION_HEADER.size
+        payload = memoryview(data)[pos:pos + length]
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            raise ValueError(f"save section {tag.decode(errors='replace')!r} is damaged")
+        pos += length
+        records = []
+        record_pos = 0
+        while record_pos < length:
+            (record_length,) = RECORD_LENGTH.unpack_from(payload, record_pos)
+            record_pos += RECORD_LENGTH.size
+            records.append(bytes(payload[record_pos:record_pos + record_length]))
+            record_pos += record_length
+        sections[tag] = records
+    return sections
+
+
+def read_save(path):
+    with open(path, "rb") as f:
+        return decode_save(f.read())
+
+
+def load_save(path):
+    """read_save for starting a game: {} when there is no save, or when it is damaged.
+
+    A damaged file is reported and left where it is; the game's first
+    successful save replaces it.
+    """
+    try:
+        return read_save(path)
+    except FileNotFoundError:
+        return {}
+    except ValueError as error:
+        print(f"CATSDK: Couldn't load save {path} ({error}); starting a new game")
+        return {}
+
+
+# --- Record codecs ---
+# encode_* take (key, value) as SaveWriter passes them; decode_* take one record's bytes.
+
+def encode_player(key, player):
+    map_id, x, y, facing = player
+    return PLAYER_RECORD.pack(x, y, FACINGS.index(facing)) + map_id.encode()
+
+
+def decode_player(record):
+    """(map_id, x, y, facing)"""
+    x, y, facing = PLAYER_RECORD.unpack_from(record)
+    return record[PLAYER_RECORD.size:].decode(), x, y, FACINGS[facing]
+
+
+def encode_world(key, seed):
+    return WORLD_RECORD.pack(seed)
+
+
+def decode_world(record):
+    return WORLD_RECORD.unpack(record)[0]
+
+
+def encode_party(key, box):
+    return box.tobytes()
+
+
+def decode_party(record):
+    return PokemonBox.frombytes(record)
+
+
+def _encode_tile_edits(edits):
+    return b"".join(TILE_EDIT.pack(x, y, tile) for (x, y), tile in edits.items())
+
+
+def _decode_tile_edits(data):
+    return {(x, y): tile for x, y, tile in TILE_EDIT.iter_unpack(data)}
+
+
+def encode_map_edits(map_id, edits):
+    """One map's changed tiles, {(x, y): tile}, under the map's id."""
+    name = map_id.encode()
+    return bytes([len(name)]) + name + _encode_tile_edits(edits)
+
+
+def decode_map_edits(record):
+    """(map_id, {(x, y): tile})"""
+    name_end = 1 + record[0]
+    return record[1:name_end].decode(), _decode_tile_edits(record[name_end:])
+
+
+def encode_chunk_edits(chunk, edits):
+    """One chunk's changed tiles, {(local x, local y): tile}, under its (chunk x, chunk y)."""
+    return CHUNK_KEY.pack(*chunk) + _encode_tile_edits(edits)
+
+
+def decode_chunk_edits(record):
+    """((chunk x, chunk y), {(local x, local y): tile})"""
+    return CHUNK_KEY.unpack_from(record), _decode_tile_edits(record[CHUNK_KEY.size:])
+
+
+class SaveWriter:
+    """Writes a save file in the background, re-encoding only what changed.
+
+    The game hands save() a snapshot of just the records that changed since
+    its last save, as {tag: {key: value}} (a value of None deletes the
+    record). Taking that snapshot is all the frame thread does; encoding
+    and the atomic file write happen on a worker thread. Encoded records are
+    kept between saves, so a record that has not changed is never encoded
+    again, however large the rest of the save is.
+
+    encoders maps each section tag to encode(key, value) -> bytes. Sections
+    are written in the order of encoders. The first save() must carry every
+    record, since nothing from an existing file is kept.
+    """
+
+    def __init__(self, path, encoders):
+        self.path = path
+        self.encoders = encoders
+        self.records = {tag: {} for tag in encoders}  # tag -> {key: encoded bytes}; worker thread only
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+        self.saves_written = 0
+        self.last_error = None
+
+    def save(self, changes):
+        """Queues a write of the save with changes applied; returns the Future."""
+        return self.worker.submit(self._write, changes)
+
+    def _write(self, changes):
+        # Nobody waits on these futures, so every failure is reported here.
+        try:
+            for tag, changed_records in changes.items():
+                records = self.records[tag]
+                encode = self.encoders[tag]
+                for key, value in changed_records.items():
+                    if value is None:
+                        records.pop(key, None)
+                    else:
+                        records[key] = encode(key, value)
+            data = encode_save({tag: list(self.records[tag].values()) for tag in self.encoders})
+            write_atomic(self.path, data)
+        except Exception as error:
+            self.last_error = error
+            print(f"CATSDK: Couldn't write save {self.path}: {error}")
+            return False
+        self.saves_written += 1
+        return True
+
+    def close(self):
+        """Waits for queued saves to finish."""
+        self.worker.shutdown(wait=True)
@@ -0,0 +1,172 @@
+import heapq
+import itertools
+
+
+def ticks_for_ms(delay_ms, tick_rate):
+    """Whole ticks covering delay_ms of game time (at least one)."""
+    return max(1, round(delay_ms * tick_rate / 1000))
+
+
+class Timer:
+    __slots__ = ("due_tick", "repeat", "callback", "args", "key", "seq", "remaining", "cancelled")
+
+    def __init__(self, due_tick, repeat, callback, args, key):
+        self.due_tick = due_tick
+        self.repeat = repeat        # Ticks between runs; 0 runs once
+        self.callback = callback
+        self.args = args
+        self.key = key
+        self.seq = None             # Identifies the live heap entry; None while paused or cancelled
+        self.remaining = None       # Ticks left when paused
+        self.cancelled = False
+
+    @property
+    def paused(self):
+        return self.remaining is not None
+
+    @property
+    def pending(self):
+        """Still due to run: queued or paused (False once a one-shot timer has fired or any timer is cancelled)."""
+        return self.seq is not None or self.paused
+
+    def __repr__(self):
+        return f"Timer({self.due_tick}, {self.repeat}, {self.callback.__name__}, {self.args!r}, {self.key!r})"
+
+
+class TickScheduler:
+    """Delayed and repeating callbacks on game ticks, kept in a binary heap.
+
+    Nothing here looks at the wall clock: the owner calls run_until(tick) as
+    its tick counter advances, so headless runs and replays fire every
+    callback on exactly the same tick as live play, only faster. Timers due
+    on the same tick run in the order they were scheduled.
+
+    Scheduling with a key replaces any pending timer with that key, the way
+    re-arming a pygame set_timer event does. Cancelled and paused timers are
+    dropped from the heap lazily.
+
+    While the whole scheduler is paused, now stays at the tick it was paused
+    on, so anything scheduled meanwhile counts its delay from there; resume()
+    then moves every pending timer and now forward by the paused time.
+    """
+
+    def __init__(self, now=0):
+        self.now = now
+        self.heap = []
+        self.keyed = {}
+        self.counter = itertools.count()
+        self.paused_at = None
+        self.latest_tick = now  # Last tick given to run_until; ahead of now while paused
+        self.paused_timers = {}  # Individually paused timers, in pause order
+        self.stale_entries = 0
+
+    def __len__(self):
+        return len(self.heap) - self.stale_entries + len(self.paused_timers)
+
+    def _push(self, timer):
+        timer.seq = next(self.counter)
+        heapq.heappush(self.heap, (timer.due_tick, timer.seq, timer))
+
+    def _drop_entry(self, timer):
+        if timer.seq is not None:
+            timer.seq = None
+            self.stale_entries += 1
+            if self.stale_entries > 64 and self.stale_entries * 2 > len(self.heap):
+                self.heap = [entry for entry in self.heap if entry[1] == entry[2].seq]
+                heapq.heapify(self.heap)
+                self.stale_entries = 0
+
+    def schedule(self, delay_ticks, callback, *args, repeat=0, key=None):
+        """Runs callback(*args) delay_ticks from now (at least one), then every repeat ticks if repeat > 0."""
+        if key is not None and key in self.keyed:
+            self.cancel(self.keyed[key])
+        timer = Timer(self.now + max(1, delay_ticks), repeat, callback, args, key)
+        if key is not None:
+            self.keyed[key] = timer
+        self._push(timer)
+        return timer
+
+    def cancel(self, timer):
+        """Cancels a Timer (or the pending timer with that key); returns whether anything was pending."""
+        if not isinstance(timer, Timer):
+            timer = self.keyed.get(timer)
+            if timer is None:
+                return False
+        if not timer.pending:
+            return False
+        timer.cancelled = True
+        timer.remaining = None
+        self.paused_timers.pop(timer, None)
+        self._drop_entry(timer)
+        if timer.key is not None and self.keyed.get(timer.key) is timer:
+            del self.keyed[timer.key]
+        return True
+
+    def pause(self, timer=None):
+        """Freezes one timer, or with no argument the whole scheduler."""
+        if timer is None:
+            if self.paused_at is None:
+                self.paused_at = self.now
+        elif timer.seq is not None:
+            timer.remaining = max(1, timer.due_tick - self.now)
+            self.paused_timers[timer] = None
+            self._drop_entry(timer)
+
+    def resume(self, timer=None):
+        if timer is None:
+            if self.paused_at is not None:
+                # Every pending timer slips by the paused time; order is unchanged.
+                shift = self.latest_tick - self.paused_at
+                self.paused_at = None
+                self.now = self.latest_tick
+                self.heap = [(due_tick + shift, seq, timer) for due_tick, seq, timer in self.heap]
+                for _, seq, timer in self.heap:
+                    if seq == timer.seq:
+                        timer.due_tick += shift
+        elif timer.paused and not timer.cancelled:
+            timer.due_tick = self.now + timer.remaining
+            timer.remaining = None
+            del self.paused_timers[timer]
+            self._push(timer)
+
+    def next_due_tick(self):
+        """Tick of the earliest pending callback, or None if nothing will fire."""
+        if self.paused_at is not None:
+            return None
+        heap = self.heap
+        while heap and heap[0][1] != heap[0][2].seq:
+            heapq.heappop(heap)
+            self.stale_entries -= 1
+        return heap[0][0] if heap else None
+
+    def run_until(self, tick):
+        """Advances to tick and runs every callback due by then; returns how many ran."""
+        self.latest_tick = tick
+        if self.paused_at is not None:
+            return 0
+        self.now = tick
+        ran = 0
+        heap = self.heap
+        while heap and heap[0][0] <= tick:
+            due_tick, seq, timer = heapq.heappop(heap)
+            if seq != timer.seq:
+                self.stale_entries -= 1
+                continue
+            timer.seq = None
+            if timer.repeat > 0:
+                timer.due_tick = due_tick + timer.repeat
+                self._push(timer)
+            elif timer.key is not None and self.keyed.get(timer.key) is timer:
+                del self.keyed[timer.key]
+            timer.callback(*timer.args)
+            ran += 1
+            if self.paused_at is not None:
+                break
+        return ran
+
+    def snapshot(self):
+        """Pending timers as plain tuples, in firing order (for state digests)."""
+        live = sorted((due_tick, seq, timer) for due_tick, seq, timer in self.heap if seq == timer.seq)
+        return ([(timer.due_tick, timer.repeat, timer.callback.__name__, timer.args, timer.key) for _, _, timer in live] +
+                [("paused", timer.remaining, timer.repeat, timer.callback.__name__, timer.args, timer.key)
+                 for timer in self.paused_timers])
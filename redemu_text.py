@@ -0,0 +1,185 @@
+import weakref
+from collections import OrderedDict
+
+import pygame
+
+WORD_WIDTH_CACHE_LIMIT = 4096
+
+# font -> {word: pixel width}; dropped automatically when the font goes away.
+_word_widths_by_font = weakref.WeakKeyDictionary()
+
+
+def _word_widths(font):
+    widths = _word_widths_by_font.get(font)
+    if widths is None or len(widths) > WORD_WIDTH_CACHE_LIMIT:
+        widths = {}
+        _word_widths_by_font[font] = widths
+    return widths
+
+
+def _measure(font, widths, word):
+    width = widths.get(word)
+    if width is None:
+        width = widths[word] = font.size(word)[0]
+    return width
+
+
+def _split_long_word(word, font, widths, max_width):
+    """Breaks a word wider than max_width into pieces that fit, character by character."""
+    pieces = []
+    piece_start = 0
+    piece_width = 0
+    for i, char in enumerate(word):
+        char_width = _measure(font, widths, char)
+        if piece_width + char_width > max_width and i > piece_start:
+            pieces.append(word[piece_start:i])
+            piece_start = i
+            piece_width = 0
+        piece_width += char_width
+    pieces.append(word[piece_start:])
+    return pieces
+
+
+def wrap_text(text, font, max_width):
+    """Wraps text to fit a specified width.
+
+    Each distinct word (and the space) is measured once per font; lines are
+    then laid out greedily from running width sums. Hard newlines start a new
+    line and words wider than max_width are split across lines.
+    """
+    widths = _word_widths(font)
+    space_width = _measure(font, widths, " ")
+    lines = []
+    for paragraph in text.split("\n"):
+        line_words = []
+        line_width = 0
+        for word in paragraph.split(" "):
+            if not word:
+                continue
+            word_width = _measure(font, widths, word)
+            if word_width > max_width:
+                pieces = _split_long_word(word, font, widths, max_width)
+                if line_words:
+                    lines.append(" ".join(line_words))
+                lines.extend(pieces[:-1])
+                word = pieces[-1]
+                word_width = _measure(font, widths, word)
+                line_words = []
+                line_width = 0
+            if not line_words:
+                line_words.append(word)
+                line_width = word_width
+            elif line_width + space_width + word_width <= max_width:
+                line_words.append(word)
+                line_width += space_width + word_width
+            else:
+                lines.append(" ".join(line_words))
+                line_words = [word]
+                line_width = word_width
+        lines.append(" ".join(line_words))
+    return lines
+
+
+class DialoguePage:
+    """One textbox page of wrapped lines, rendered once onto its own surface.
+
+    A typewriter reveal never re-renders text: reveal_rects() gives the
+    parts of the page surface uncovered between two character counts, and
+    only those are blitted. Character counts run over the page's lines
+    without the spaces dropped at line breaks.
+    """
+
+    def __init__(self, lines, font, line_height, color, background):
+        self.lines = lines
+        self.line_height = line_height
+        self.surface = pygame.Surface((max([font.size(line)[0] for line in lines] + [1]), line_height * len(lines)))
+        self.surface.fill(background)
+        # (line, x) where each character ends; a line's last character reaches
+        # the page edge so glyph overhang at the end of a line is never cut off.
+        self.char_ends = []
+        for index, line in enumerate(lines):
+            self.surface.blit(font.render(line, True, color, background), (0, index * line_height))
+            line_end = 0
+            for glyph in font.metrics(line):  # One call per line rather than one size() per prefix
+                line_end += glyph[4] if glyph else 0
+                self.char_ends.append((index, line_end))
+            if line:
+                self.char_ends[-1] = (index, self.surface.get_width())
+        self.char_count = len(self.char_ends)
+
+    def __repr__(self):
+        return f"DialoguePage({self.lines!r})"
+
+    def _progress(self, chars):
+        # Lines before the returned one are fully shown; that one is shown up to x.
+        if chars <= 0:
+            return 0, 0
+        return self.char_ends[min(chars, self.char_count) - 1]
+
+    def reveal_rects(self, start_chars, end_chars):
+        """Page-relative rects uncovered going from start_chars to end_chars characters shown."""
+        if end_chars <= start_chars:
+            return []
+        start_line, start_x = self._progress(start_chars)
+        end_line, end_x = self._progress(end_chars)
+        width, height = self.surface.get_width(), self.line_height
+        if start_line == end_line:
+            rects = [pygame.Rect(start_x, start_line * height, end_x - start_x, height)]
+        else:
+            rects = [pygame.Rect(start_x, start_line * height, width - start_x, height),
+                     pygame.Rect(0, (start_line + 1) * height, width, (end_line - start_line - 1) * height),
+                     pygame.Rect(0, end_line * height, end_x, height)]
+        return [rect for rect in rects if rect.width > 0 and rect.height > 0]
+
+
+def paginate_text(text, font, max_width, lines_per_page, line_height, color, background):
+    """Wraps text and renders it into DialoguePages of at most lines_per_page lines."""
+    lines = wrap_text(text, font, max_width)
+    return [DialoguePage(lines[start:start + lines_per_page], font, line_height, color, background)
+            for start in range(0, len(lines), lines_per_page)]
+
+
+class TextSurfaceCache:
+    """Bounded LRU cache of rendered text surfaces.
+
+    Entries are keyed by (font, text, color, antialias). The game renders the
+    same few strings every frame, so nearly every call should be a hit.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.surfaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,122 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from redemu_battle import POKEMON_DATA, simulate_battles, summarize_battle_stats
+
+TUNABLE_STATS = ("hp", "attack", "defense")
+
+
+def stat_grid_variants(base_data, species, grid):
+    """Yields (label, species_table) for every combination of stat deltas.
+
+    grid maps a stat name to the deltas to try on `species`, e.g.
+    {"attack": [-1, 0, 1], "hp": [-5, 0, 5]}. With an empty grid only the
+    unmodified table is produced.
+    """
+    stats = sorted(grid)
+    for deltas in itertools.product(*(grid[stat] for stat in stats)):
+        table = {name: dict(data) for name, data in base_data.items()}
+        changed = table[species] if species else None
+        label_parts = []
+        for stat, delta in zip(stats, deltas):
+            changed[stat] = max(1, changed[stat] + delta)
+            if stat == "hp":
+                changed["max_hp"] = changed["hp"]
+            if delta:
+                label_parts.append(f"{stat}{delta:+d}")
+        yield (f"{species} " + " ".join(label_parts) if label_parts else "base"), table
+
+
+def _run_matchup(variant, attacker_name, defender_name, attacker, defender, battles, seed_sequence):
+    # Runs in a worker process; the SeedSequence child makes the result
+    # independent of which worker picks the task up or in what order.
+    stats = simulate_battles(attacker, defender, battles, np.random.default_rng(seed_sequence))
+    return variant, attacker_name, defender_name, stats
+
+
+def run_tournament(variants, battles_per_matchup, seed=None, workers=None, on_result=None):
+    """Runs every all-pairs matchup of every variant across a process pool.
+
+    variants is an iterable of (label, species_table). Each matchup gets its
+    own child of SeedSequence(seed), so a fixed seed reproduces the whole
+    sweep exactly. on_result(variant, attacker, defender, summary) is called
+    as each matchup finishes. Returns {variant: {(attacker, defender): summary}}.
+    """
+    root_seed = np.random.SeedSequence(seed)
+    tasks = []
+    for label, table in variants:
+        for attacker_name, defender_name in itertools.product(table, repeat=2):
+            tasks.append((label, attacker_name, defender_name, table[attacker_name], table[defender_name]))
+    seed_sequences = root_seed.spawn(len(tasks))
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_matchup, *task, battles_per_matchup, seed_sequence)
+                   for task, seed_sequence in zip(tasks, seed_sequences)]
+        for future in as_completed(futures):
+            variant, attacker_name, defender_name, stats = future.result()
+            summary = summarize_battle_stats(stats)
+            results.setdefault(variant, {})[(attacker_name, defender_name)] = summary
+            if on_result:
+                on_result(variant, attacker_name, defender_name, summary)
+    return results
+
+
+def species_win_rates(matchups):
+    """Overall win rate of each species across a variant's matchups, counting both sides."""
+    wins = {}
+    games = {}
+    for (attacker_name, defender_name), summary in matchups.items():
+        rate = summary["attacker_win_rate"]
+        wins[attacker_name] = wins.get(attacker_name, 0.0) + rate
+        wins[defender_name] = wins.get(defender_name, 0.0) + (1.0 - rate)
+        games[attacker_name] = games.get(attacker_name, 0) + 1
+        games[defender_name] = games.get(defender_name, 0) + 1
+    return {name: wins[name] / games[name] for name in wins}
+
+
+def format_summary_table(results):
+    species = sorted({name for matchups in results.values() for pair in matchups for name in pair})
+    lines = [f"{'variant':<28}" + "".join(f"{name:>13}" for name in species) + f"{'spread':>9}"]
+    for variant in sorted(results):
+        rates = species_win_rates(results[variant])
+        spread = max(rates.values()) - min(rates.values())
+        lines.append(f"{variant:<28}" + "".join(f"{rates.get(name, 0.0):>13.1%}" for name in species) + f"{spread:>9.1%}")
+    return "\n".join(lines)
+
+
+def parse_grid_option(option):
+    stat, _, values = option.partition("=")
+    if stat not in TUNABLE_STATS or not values:
+        raise argparse.ArgumentTypeError(f"expected one of {', '.join(TUNABLE_STATS)}=delta,delta,... (got {option!r})")
+    return stat, [int(value) for value in values.split(",")]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="All-pairs species balance sweep over POKEMON_DATA")
+    parser.add_argument("-n", "--battles", type=int, default=200_000, help="battles per matchup")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--species", default="KITTENPUNCH", help="species whose stats the grid varies")
+    parser.add_argument("--grid", type=parse_grid_option, action="append", default=[],
+                        help="stat deltas to sweep, e.g. --grid attack=-1,0,1 --grid hp=-5,0,5")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary table")
+    args = parser.parse_args()
+
+    def report(variant, attacker_name, defender_name, summary):
+        if not args.quiet:
+            print(f"{variant:<28} {attacker_name:>12} vs {defender_name:<12} win {summary['attacker_win_rate']:6.1%} "
+                  f"turns {summary['mean_turns']:5.2f}", flush=True)
+
+    start = time.perf_counter()
+    variants = stat_grid_variants(POKEMON_DATA, args.species, dict(args.grid))
+    results = run_tournament(variants, args.battles, args.seed, args.workers, report)
+    elapsed = time.perf_counter() - start
+    total_battles = args.battles * sum(len(matchups) for matchups in results.values())
+    print(format_summary_table(results))
+    print(f"{total_battles:,} battles in {elapsed:.2f}s on {args.workers} workers")
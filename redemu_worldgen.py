@@ -0,0 +1,308 @@
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import numpy as np
+
+# --- Tile Types (same numbering as 1.py) ---
+TILE_PATH = 0
+TILE_GRASS = 1
+TILE_WALL = 2
+TILE_WATER = 3
+
+CHUNK_SIZE = 32          # Tiles per chunk side
+CHUNK_CACHE_LIMIT = 64   # Chunks kept in memory; everything else is regenerated on demand
+
+
+# --- Biome Generation ---
+ROAD_SPACING = 16  # Lattice of always-walkable rows and columns; CHUNK_SIZE must be a multiple of it
+NOISE_OCTAVES = ((32, 0.55), (16, 0.3), (8, 0.15))  # (lattice cell size in tiles, weight)
+WATER_LEVEL = 0.36
+ROCK_LEVEL = 0.66
+GRASS_MOISTURE = 0.45
+BOULDER_CHANCE = 0.04
+SALT_ELEVATION = 1
+SALT_MOISTURE = 2
+SALT_DETAIL = 3
+_MASK64 = (1 << 64) - 1
+
+
+def _hash01(world_seed, salt, xs, ys):
+    """Uniform [0, 1) value per integer (x, y), the same wherever it is evaluated."""
+    h = (xs.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) ^ (ys.astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F))
+    h ^= np.uint64((world_seed * 0x100000001B3 + salt * 0x632BE59BD9B4E019) & _MASK64)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xC4CEB9FE1A85EC53)
+    h ^= h >> np.uint64(33)
+    return (h >> np.uint64(40)).astype(np.float32) * np.float32(1.0 / (1 << 24))
+
+
+def value_noise(world_seed, salt, x0, y0, width, height, cell):
+    """Smoothly interpolated lattice noise in [0, 1) over a window of world tiles."""
+    xs = np.arange(x0, x0 + width)
+    ys = np.arange(y0, y0 + height)
+    cell_x, cell_y = xs // cell, ys // cell
+    lattice_x = np.arange(cell_x[0], cell_x[-1] + 2)
+    lattice_y = np.arange(cell_y[0], cell_y[-1] + 2)
+    lattice = _hash01(world_seed, salt, lattice_x[None, :], lattice_y[:, None])
+    tx = ((xs - cell_x * cell) / cell).astype(np.float32)
+    ty = ((ys - cell_y * cell) / cell).astype(np.float32)
+    sx = tx * tx * (3 - 2 * tx)
+    sy = (ty * ty * (3 - 2 * ty))[:, None]
+    ix, iy = cell_x - lattice_x[0], cell_y - lattice_y[0]
+    # Interpolate along x on the few lattice rows, then along y per tile row.
+    rows = lattice[:, ix] * (1 - sx) + lattice[:, ix + 1] * sx
+    return rows[iy] * (1 - sy) + rows[iy + 1] * sy
+
+
+def fractal_noise(world_seed, salt, x0, y0, width, height, octaves=NOISE_OCTAVES):
+    total = np.zeros((height, width), dtype=np.float32)
+    for octave, (cell, weight) in enumerate(octaves):
+        total += np.float32(weight) * value_noise(world_seed, salt * 16 + octave, x0, y0, width, height, cell)
+    return total / np.float32(sum(weight for _, weight in octaves))
+
+
+def _shifted_any(mask):
+    """True where any 4-neighbour of the cell is True."""
+    out = np.zeros_like(mask)
+    out[1:, :] |= mask[:-1, :]
+    out[:-1, :] |= mask[1:, :]
+    out[:, 1:] |= mask[:, :-1]
+    out[:, :-1] |= mask[:, 1:]
+    return out
+
+
+def _connect_to_roads(tiles, walkable, x0, y0):
+    """Carves a path from every walkable pocket that cannot reach the road lattice.
+
+    tiles must start and end on lattice lines. Every lattice cell is walkable,
+    so a pocket is confined to one lattice block; it is joined by a straight
+    cut north from its first cell (row-major) to the lattice row above.
+    """
+    height, width = tiles.shape
+    xs = np.arange(x0, x0 + width)
+    ys = np.arange(y0, y0 + height)
+    on_road = (ys % ROAD_SPACING == 0)[:, None] | (xs % ROAD_SPACING == 0)[None, :]
+    reached = on_road.copy()
+    while True:
+        grown = reached | (_shifted_any(reached) & walkable)
+        if np.array_equal(grown, reached):
+            break
+        reached = grown
+    stranded = walkable & ~reached
+    if not stranded.any():
+        return
+    # Label the pockets: every cell takes the smallest index in its pocket.
+    big = np.int64(height * width)
+    labels = np.where(stranded, np.arange(height * width, dtype=np.int64).reshape(height, width), big)
+    while True:
+        smallest = labels.copy()
+        np.minimum(smallest[1:, :], labels[:-1, :], out=smallest[1:, :])
+        np.minimum(smallest[:-1, :], labels[1:, :], out=smallest[:-1, :])
+        np.minimum(smallest[:, 1:], labels[:, :-1], out=smallest[:, 1:])
+        np.minimum(smallest[:, :-1], labels[:, 1:], out=smallest[:, :-1])
+        smallest[~stranded] = big
+        if np.array_equal(smallest, labels):
+            break
+        labels = smallest
+    firsts = np.unique(labels[stranded])
+    first_y, first_x = np.divmod(firsts, width)
+    steps = np.arange(ROAD_SPACING)
+    cut_y = first_y[:, None] - steps[None, :]
+    cut_x = np.broadcast_to(first_x[:, None], cut_y.shape)
+    in_cut = steps[None, :] <= ((first_y + y0) % ROAD_SPACING)[:, None]
+    cut_y, cut_x = cut_y[in_cut], cut_x[in_cut]
+    blocked = ~walkable[cut_y, cut_x]
+    tiles[cut_y[blocked], cut_x[blocked]] = TILE_PATH
+
+
+def generate_region(world_seed, x0, y0, width, height):
+    """Tiles for any window of the world as a (height, width) uint8 array.
+
+    Layered value noise picks the biome (water low, rock high, grass or
+    path by moisture, plus scattered boulders). Every ROAD_SPACING-th row and
+    column is forced walkable, and pockets cut off from that lattice get a
+    path carved to it, so every walkable tile is reachable from every other.
+    The result depends only on world coordinates, so overlapping windows
+    and neighbouring chunks always agree.
+    """
+    # Work on the enclosing lattice-aligned window so the pocket carving is
+    # the same no matter where this window starts or ends.
+    ax0 = x0 - x0 % ROAD_SPACING
+    ay0 = y0 - y0 % ROAD_SPACING
+    ax1 = x0 + width + (-(x0 + width) % ROAD_SPACING) + 1
+    ay1 = y0 + height + (-(y0 + height) % ROAD_SPACING) + 1
+    full_width, full_height = ax1 - ax0, ay1 - ay0
+
+    elevation = fractal_noise(world_seed, SALT_ELEVATION, ax0, ay0, full_width, full_height)
+    moisture = fractal_noise(world_seed, SALT_MOISTURE, ax0, ay0, full_width, full_height)
+    xs = np.arange(ax0, ax1)
+    ys = np.arange(ay0, ay1)
+    detail = _hash01(world_seed, SALT_DETAIL, xs[None, :], ys[:, None])
+
+    tiles = np.where(moisture > GRASS_MOISTURE, TILE_GRASS, TILE_PATH).astype(np.uint8)
+    tiles[detail < BOULDER_CHANCE] = TILE_WALL
+    tiles[elevation > ROCK_LEVEL] = TILE_WALL
+    tiles[elevation < WATER_LEVEL] = TILE_WATER
+    on_road = (ys % ROAD_SPACING == 0)[:, None] | (xs % ROAD_SPACING == 0)[None, :]
+    tiles[on_road & ((tiles == TILE_WALL) | (tiles == TILE_WATER))] = TILE_PATH  # Bridges and passes
+    _connect_to_roads(tiles, (tiles != TILE_WALL) & (tiles != TILE_WATER), ax0, ay0)
+    return tiles[y0 - ay0:y0 - ay0 + height, x0 - ax0:x0 - ax0 + width].copy()
+
+
+def generate_chunk(world_seed, chunk_x, chunk_y, chunk_size=CHUNK_SIZE):
+    """Tiles for one chunk as a (chunk_size, chunk_size) uint8 array."""
+    return generate_region(world_seed, chunk_x * chunk_size, chunk_y * chunk_size, chunk_size, chunk_size)
+
+
+class ChunkWorld:
+    """An endless tile world made of chunks generated from (seed, chunk_x, chunk_y).
+
+    Chunks live in a bounded LRU; an evicted chunk is regenerated bit-for-bit
+    the next time it is needed, so memory stays flat however far the player
+    walks. Tiles placed with set_tile are kept as overrides on top of the
+    generated terrain and survive eviction. Chunks near the player can be
+    generated ahead of time on a worker thread with prefetch_around.
+    """
+
+    def __init__(self, world_seed, chunk_size=CHUNK_SIZE, max_chunks=CHUNK_CACHE_LIMIT, generator=generate_chunk):
+        self.world_seed = world_seed
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.generator = generator
+        self.chunks = OrderedDict()
+        self.pending = {}
+        self.overrides = {}  # (chunk_x, chunk_y) -> {(local_x, local_y): tile}
+        self.dirty_overrides = set()  # Chunks whose overrides changed since take_dirty_overrides()
+        self.shared_overrides = set()  # Chunks whose override dicts were handed out; copied before the next edit
+        self.lock = threading.Lock()
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunk-gen")
+        self.generated = 0
+        self.evictions = 0
+
+    def _build_chunk(self, chunk_x, chunk_y):
+        tiles = self.generator(self.world_seed, chunk_x, chunk_y, self.chunk_size)
+        for (local_x, local_y), tile in list(self.overrides.get((chunk_x, chunk_y), {}).items()):
+            tiles[local_y, local_x] = tile
+        return tiles
+
+    def _store(self, key, tiles):
+        # Caller holds self.lock.
+        self.generated += 1
+        self.chunks[key] = tiles
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+            self.evictions += 1
+
+    def _prefetch_chunk(self, chunk_x, chunk_y):
+        tiles = self._build_chunk(chunk_x, chunk_y)
+        with self.lock:
+            self.pending.pop((chunk_x, chunk_y), None)
+            self._store((chunk_x, chunk_y), tiles)
+        return tiles
+
+    def chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        with self.lock:
+            tiles = self.chunks.get(key)
+            if tiles is not None:
+                self.chunks.move_to_end(key)
+                return tiles
+            future = self.pending.get(key)
+        if future:
+            # The worker stores the chunk itself; just wait for it.
+            return future.result()
+        tiles = self._build_chunk(chunk_x, chunk_y)
+        with self.lock:
+            self._store(key, tiles)
+        return tiles
+
+    def prefetch_around(self, x, y, radius=1):
+        """Queues generation of every chunk within radius chunks of tile (x, y)."""
+        center_x, center_y = x // self.chunk_size, y // self.chunk_size
+        with self.lock:
+            for chunk_y in range(center_y - radius, center_y + radius + 1):
+                for chunk_x in range(center_x - radius, center_x + radius + 1):
+                    key = (chunk_x, chunk_y)
+                    if key not in self.chunks and key not in self.pending:
+                        self.pending[key] = self.worker.submit(self._prefetch_chunk, chunk_x, chunk_y)
+
+    def tile_at(self, x, y):
+        chunk_x, local_x = divmod(x, self.chunk_size)
+        chunk_y, local_y = divmod(y, self.chunk_size)
+        return int(self.chunk(chunk_x, chunk_y)[local_y, local_x])
+
+    def set_tile(self, x, y, tile):
+        chunk_x, local_x = divmod(x, self.chunk_size)
+        chunk_y, local_y = divmod(y, self.chunk_size)
+        key = (chunk_x, chunk_y)
+        if key in self.shared_overrides:
+            self.overrides[key] = dict(self.overrides[key])
+            self.shared_overrides.discard(key)
+        self.overrides.setdefault(key, {})[(local_x, local_y)] = tile
+        self.dirty_overrides.add(key)
+        self.chunk(chunk_x, chunk_y)[local_y, local_x] = tile
+
+    def restore_overrides(self, overrides):
+        """Puts back saved overrides ({(chunk_x, chunk_y): {(local_x, local_y): tile}}).
+
+        Call before anything is prefetched: chunks already cached are patched,
+        but one being generated on the worker right now would miss them.
+        """
+        with self.lock:
+            for key, tiles_by_spot in overrides.items():
+                if key in self.shared_overrides:
+                    self.overrides[key] = dict(self.overrides[key])
+                    self.shared_overrides.discard(key)
+                self.overrides.setdefault(key, {}).update(tiles_by_spot)
+                self.dirty_overrides.add(key)
+                tiles = self.chunks.get(key)
+                if tiles is not None:
+                    for (local_x, local_y), tile in tiles_by_spot.items():
+                        tiles[local_y, local_x] = tile
+
+    def take_dirty_overrides(self):
+        """The overrides of every chunk edited since the last call (for saving).
+
+        The dicts are handed over without copying and must not be modified;
+        set_tile copies a chunk's dict the next time it edits that chunk, so
+        the cost here is one reference per edited chunk.
+        """
+        dirty = {key: self.overrides[key] for key in self.dirty_overrides}
+        self.shared_overrides |= self.dirty_overrides
+        self.dirty_overrides = set()
+        return dirty
+
+    def region(self, x, y, width, height):
+        """Copies the tiles of a width x height window whose top-left tile is (x, y)."""
+        size = self.chunk_size
+        out = np.empty((height, width), dtype=np.uint8)
+        for chunk_y in range(y // size, (y + height - 1) // size + 1):
+            for chunk_x in range(x // size, (x + width - 1) // size + 1):
+                tiles = self.chunk(chunk_x, chunk_y)
+                x0, y0 = max(x, chunk_x * size), max(y, chunk_y * size)
+                x1, y1 = min(x + width, (chunk_x + 1) * size), min(y + height, (chunk_y + 1) * size)
+                out[y0 - y:y1 - y, x0 - x:x1 - x] = tiles[y0 - chunk_y * size:y1 - chunk_y * size,
+                                                          x0 - chunk_x * size:x1 - chunk_x * size]
+        return out
+
+    def shutdown(self):
+        self.worker.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a world map and report timing and biome mix")
+    parser.add_argument("--size", type=int, default=1024, help="map width and height in tiles")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    world_map = generate_region(args.seed, 0, 0, args.size, args.size)
+    elapsed = time.perf_counter() - start
+    counts = np.bincount(world_map.ravel(), minlength=4) / world_map.size
+    print(f"{args.size}x{args.size} in {elapsed:.3f}s  path {counts[TILE_PATH]:.1%}  grass {counts[TILE_GRASS]:.1%}  "
+          f"wall {counts[TILE_WALL]:.1%}  water {counts[TILE_WATER]:.1%}")